@@ -8,9 +8,15 @@ odzyskać wszystkie straty i osiągnąć co najmniej +100 zł łącznego zysku.
 """
 
 import csv
+import io
 import math
 import os
-from typing import List, Dict, Optional
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import accumulate, chain, islice
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+
+from business_logic import format_cents, gross_cents, parse_float, to_cents
 
 
 # ============================================================================
@@ -18,7 +24,12 @@ from typing import List, Dict, Optional
 # ============================================================================
 
 CSV_FILE = "baza_kuponow.csv"
-CSV_HEADERS = [
+IO_BUFFER_SIZE = 1 << 20  # 1 MiB - cały typowy plik w jednym odczycie/zapisie
+
+# Klucz wersji pliku CSV (mtime_ns, rozmiar) po ostatnim zapisie przez tę
+# aplikację - jeśli plik go nadal ma, nowy kupon można dopisać na końcu
+_saved_file_key: Optional[Tuple[int, int]] = None
+CSV_HEADERS = (
     "Kupon",
     "Wynik",
     "Stawka (S)",
@@ -29,62 +40,227 @@ CSV_HEADERS = [
     "Wygrana brutto",
     "Saldo",
     "Zysk netto"
-]
+)
+
+# Indeksy kolumn w wierszu CSV (kolejność CSV_HEADERS)
+(KUPON, WYNIK, STAWKA, KURS, ZASILENIE, SUMA_ZASILEN, SUMA_WLOZONA,
+ WYGRANA_BRUTTO, SALDO, ZYSK_NETTO) = range(len(CSV_HEADERS))
+
+# Kody statusu kuponu (kolumna Wynik) - w obliczeniach porównujemy liczby,
+# a tekst z pliku zostaje tylko do wyświetlania i zapisu
+STATUS_PENDING, STATUS_WIN, STATUS_LOSS, STATUS_UNKNOWN = range(4)
+STATUS_CODES = {
+    "OCZEKUJE": STATUS_PENDING,
+    "WYGRANA": STATUS_WIN,
+    "PRZEGRANA": STATUS_LOSS
+}
+STATUS_ICONS = {STATUS_WIN: "✅", STATUS_LOSS: "❌"}
 
 # Domyślny docelowy zysk - można nadpisać przez zmienną środowiskową PROFIT_TARGET
 PROFIT_TARGET = float(os.getenv("PROFIT_TARGET", "100"))
+# Stałe teksty z celem - formatowane raz, cel nie zmienia się w trakcie działania
+PROFIT_TARGET_STR = f"{PROFIT_TARGET:.2f}"
+TARGET_LABEL = f"wkład + {PROFIT_TARGET_STR} zł"
+
+
+# ============================================================================
+# MODEL DANYCH
+# ============================================================================
+
+@dataclass
+class Coupons:
+    """
+    Kupony w układzie kolumnowym - osobna lista dla każdej kolumny.
+    
+    Wartości liczbowe są parsowane raz przy wczytaniu pliku, a do tekstu
+    wracają dopiero przy zapisie (save_rows). Kwoty (stawki, zasilenia,
+    wygrane, sumy, saldo) są trzymane w groszach jako int - sumy są dokładne,
+    bez narastających błędów zaokrągleń float. Kurs pozostaje float.
+    """
+    numbers: List[str] = field(default_factory=list)
+    results: List[str] = field(default_factory=list)
+    statuses: List[int] = field(default_factory=list)
+    stakes: List[int] = field(default_factory=list)
+    odds: List[float] = field(default_factory=list)
+    deposits: List[int] = field(default_factory=list)
+    # Agregaty - wyliczane przez recompute_aggregates
+    sum_deposits: List[int] = field(default_factory=list)
+    sum_stakes: List[int] = field(default_factory=list)
+    gross_wins: List[int] = field(default_factory=list)
+    balances: List[int] = field(default_factory=list)
+    # Sumy dla rozstrzygniętych kuponów (WYGRANA/PRZEGRANA) - stan gry
+    settled_stakes: int = 0
+    settled_wins: int = 0
+    # Największy numer kuponu - następny kupon dostaje max_number + 1
+    max_number: int = 0
+    # Czy agregaty odpowiadają aktualnym danym (zmiana kuponów je unieważnia)
+    aggregates_ready: bool = False
+    
+    def __len__(self) -> int:
+        return len(self.numbers)
+    
+    def append(self, number: str, result: str, stake: int, odds: float,
+               deposit: int) -> None:
+        """
+        Dodaje kupon na koniec (agregaty zostaną przeliczone).
+        
+        Args:
+            number: Numer kuponu.
+            result: Wynik kuponu (WYGRANA/PRZEGRANA/OCZEKUJE).
+            stake: Stawka w groszach.
+            odds: Kurs.
+            deposit: Zasilenie przy tym kuponie w groszach.
+        """
+        self.numbers.append(number)
+        try:
+            self.max_number = max(self.max_number, int(number))
+        except ValueError:
+            pass  # Nienumeryczny numer (ręczna edycja) - pomijamy
+        self.results.append(result)
+        self.statuses.append(status_code(result))
+        self.stakes.append(stake)
+        self.odds.append(odds)
+        self.deposits.append(deposit)
+        self.sum_deposits.append(0)
+        self.sum_stakes.append(0)
+        self.gross_wins.append(0)
+        self.balances.append(0)
+        self.aggregates_ready = False
+    
+    def set_result(self, idx: int, result: str) -> None:
+        """
+        Ustawia wynik kuponu (tekst i kod statusu).
+        
+        Args:
+            idx: Indeks kuponu.
+            result: Nowy wynik (WYGRANA/PRZEGRANA/OCZEKUJE).
+        """
+        self.results[idx] = result
+        self.statuses[idx] = status_code(result)
+        self.aggregates_ready = False
+
+
+def status_code(result: str) -> int:
+    """
+    Zamienia tekst wyniku na kod statusu.
+    
+    Args:
+        result: Wynik z kolumny Wynik (wielkość liter i spacje bez znaczenia).
+    
+    Returns:
+        Kod STATUS_* (STATUS_UNKNOWN dla nierozpoznanego tekstu).
+    """
+    return STATUS_CODES.get(result.strip().upper(), STATUS_UNKNOWN)
 
 
 # ============================================================================
 # FUNKCJE POMOCNICZE - OBSŁUGA CSV
 # ============================================================================
 
-def load_rows() -> List[Dict[str, str]]:
+def load_rows() -> Optional[Coupons]:
     """
-    Wczytuje wiersze z pliku CSV.
+    Wczytuje kupony z pliku CSV.
     
     Returns:
-        Lista słowników reprezentujących kupony.
-        Jeśli plik nie istnieje, zwraca pustą listę.
+        Kupony w układzie kolumnowym.
+        Jeśli plik nie istnieje, zwraca pusty zbiór kuponów.
+        Jeśli pliku nie udało się wczytać, zwraca None - pusty zbiór
+        oznaczałby pustą bazę, którą main() nadpisałby nowym kuponem.
     """
     if not os.path.exists(CSV_FILE):
-        return []
+        return Coupons()
     
     try:
-        with open(CSV_FILE, 'r', encoding='utf-8', newline='') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
+        with open(CSV_FILE, 'r', encoding='utf-8', newline='',
+                  buffering=IO_BUFFER_SIZE) as f:
+            reader = csv.reader(f)
+            header = tuple(next(reader, ()))
+            if not header:
+                return Coupons()
             
+            # Wiersze czytamy strumieniowo - prosto z readera do kolumn,
+            # bez pośredniej listy wszystkich wierszy
+            rows = reader
+            
+            # Typowy przypadek - nagłówki zgodne (jedno porównanie krotek)
+            if header == CSV_HEADERS:
+                pass
             # Sprawdź czy to stary format (bez kolumny "Zasilenie")
-            if reader.fieldnames and "Zasilenie" not in reader.fieldnames:
+            elif "Zasilenie" not in header:
                 print(f"\n⚠️  Wykryto stary format CSV. Migruję do nowego formatu...")
-                rows = migrate_old_format(rows)
+                coupons = migrate_old_format(header, reader)
                 print(f"✅ Migracja zakończona!")
+                return coupons
             # Walidacja nagłówków
-            elif reader.fieldnames != CSV_HEADERS:
+            else:
                 print(f"⚠️  Uwaga: Nagłówki w pliku nie pasują do oczekiwanych.")
-                print(f"   Oczekiwane: {CSV_HEADERS}")
-                print(f"   Znalezione: {reader.fieldnames}")
-                
-            return rows
+                print(f"   Oczekiwane: {list(CSV_HEADERS)}")
+                print(f"   Znalezione: {list(header)}")
+                rows = align_rows(header, rows)
+            
+            coupons = Coupons()
+            width = len(CSV_HEADERS)
+            for row in rows:
+                if not row:
+                    continue  # Pusta linia w pliku
+                if len(row) < width:
+                    # Brakujące pola na końcu wiersza są puste (jak w align_rows)
+                    row += [""] * (width - len(row))
+                coupons.append(
+                    row[KUPON],
+                    row[WYNIK],
+                    to_cents(parse_float(row[STAWKA]) or 0.0),
+                    parse_float(row[KURS]) or 0.0,
+                    to_cents(parse_float(row[ZASILENIE]) or 0.0)
+                )
+            return coupons
     except Exception as e:
         print(f"❌ Błąd podczas wczytywania pliku CSV: {e}")
-        return []
+        return None
 
 
-def migrate_old_format(old_rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+def align_rows(header: Tuple[str, ...],
+               rows: Iterable[List[str]]) -> Iterator[List[str]]:
+    """
+    Przestawia pola wierszy z pliku o innych nagłówkach
+    do kolejności CSV_HEADERS (brakujące kolumny są puste).
+    
+    Wiersze są przetwarzane leniwie, po jednym, a puste linie pomijane.
+    
+    Args:
+        header: Nagłówki odczytane z pliku.
+        rows: Wiersze w kolejności kolumn z pliku.
+    
+    Returns:
+        Iterator wierszy w kolejności CSV_HEADERS.
+    """
+    file_idx = {name: i for i, name in enumerate(header)}
+    positions = [file_idx.get(name) for name in CSV_HEADERS]
+    return (
+        [row[i] if i is not None and i < len(row) else "" for i in positions]
+        for row in rows if row
+    )
+
+
+def migrate_old_format(header: Tuple[str, ...],
+                       old_rows: Iterable[List[str]]) -> Coupons:
     """
     Migruje stary format CSV (bez kolumny "Zasilenie") do nowego formatu.
     Pyta użytkownika o początkowy wkład i dodaje go do pierwszego kuponu.
     
     Args:
-        old_rows: Lista kuponów w starym formacie.
-        
+        header: Nagłówki starego pliku.
+        old_rows: Wiersze w starym formacie (np. prosto z csv.reader).
+    
     Returns:
-        Lista kuponów w nowym formacie.
+        Kupony w nowym formacie.
     """
-    if not old_rows:
-        return []
+    # Wiersze są przetwarzane strumieniowo - podglądamy tylko pierwszy,
+    # żeby nie pytać o wkład, gdy plik nie ma kuponów
+    aligned = align_rows(header, old_rows)
+    first_row = next(aligned, None)
+    if first_row is None:
+        return Coupons()
     
     print("\n📋 Aby zmigrować dane, podaj początkowy wkład kapitału.")
     print("   (ile pieniędzy włożyłeś na start, przed pierwszym kuponem)")
@@ -92,69 +268,167 @@ def migrate_old_format(old_rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
     initial_deposit = ask_float("Początkowy wkład: ", min_value=0.0)
     
     # Skonwertuj wiersze do nowego formatu
-    new_rows = []
-    for i, old_row in enumerate(old_rows):
-        new_row = {
-            "Kupon": old_row.get("Kupon", str(i+1)),
-            "Wynik": old_row.get("Wynik", "OCZEKUJE"),
-            "Stawka (S)": old_row.get("Stawka (S)", "0.00"),
-            "Kurs": old_row.get("Kurs", "1.00"),
-            "Zasilenie": f"{initial_deposit:.2f}" if i == 0 else "0.00",
-            "Suma zasieleń": "0.00",  # Zostanie przeliczone
-            "Suma włożona do tej pory": "0.00",  # Zostanie przeliczone
-            "Wygrana brutto": "0.00",  # Zostanie przeliczone
-            "Saldo": "0.00",  # Zostanie przeliczone
-            "Zysk netto": "0.00"  # Zostanie przeliczone
-        }
-        new_rows.append(new_row)
+    coupons = Coupons()
+    for i, old_row in enumerate(chain((first_row,), aligned)):
+        coupons.append(
+            old_row[KUPON] or str(i+1),
+            old_row[WYNIK] or "OCZEKUJE",
+            to_cents(parse_float(old_row[STAWKA]) or 0.0),
+            parse_float(old_row[KURS] or "1.00") or 0.0,
+            to_cents(initial_deposit) if i == 0 else 0
+        )
     
     # Przelicz agregaty
-    recompute_aggregates(new_rows)
+    recompute_aggregates(coupons)
     
     # Zapisz zmigrowane dane
-    save_rows(new_rows)
+    save_rows(coupons)
     
-    return new_rows
+    return coupons
 
 
-def save_rows(rows: List[Dict[str, str]]) -> None:
+def format_rows(coupons: Coupons, start: int = 0) -> List[Tuple[str, ...]]:
     """
-    Zapisuje wiersze do pliku CSV.
+    Formatuje kupony od indeksu `start` do wierszy CSV (krotki tekstów).
+    
+    Kwoty w groszach są zamieniane na tekst (2 miejsca po przecinku) tylko tutaj,
+    a kurs bez utraty dokładności (format_odds).
+    Formatowanie idzie kolumnami (map po całej kolumnie), a wiersze składa
+    jeden zip. Zysk netto jest równy saldu (wkład jest śledzony w zasileniach).
     
     Args:
-        rows: Lista słowników z danymi kuponów.
+        coupons: Kupony do sformatowania.
+        start: Indeks pierwszego kuponu.
+    
+    Returns:
+        Lista wierszy w kolejności CSV_HEADERS.
+    """
+    balances = list(map(format_cents, coupons.balances[start:]))
+    return list(zip(
+        coupons.numbers[start:],
+        coupons.results[start:],
+        map(format_cents, coupons.stakes[start:]),
+        map(format_odds, coupons.odds[start:]),
+        map(format_cents, coupons.deposits[start:]),
+        map(format_cents, coupons.sum_deposits[start:]),
+        map(format_cents, coupons.sum_stakes[start:]),
+        map(format_cents, coupons.gross_wins[start:]),
+        balances,
+        balances  # Zysk netto = saldo
+    ))
+
+
+def save_rows(coupons: Coupons) -> None:
+    """
+    Zapisuje kupony do pliku CSV.
+    
+    Args:
+        coupons: Kupony do zapisania.
     """
     try:
-        with open(CSV_FILE, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
-            writer.writeheader()
-            writer.writerows(rows)
+        # Wszystkie wiersze formatujemy przed otwarciem pliku - jeden
+        # writerows() na gotowej liście, a błąd formatowania nie zostawi
+        # w połowie nadpisanego pliku.
+        out_rows = format_rows(coupons)
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_HEADERS)
+        writer.writerows(out_rows)
+        
+        # Jeden write() z gotowym tekstem zamiast zapisu wiersz po wierszu
+        with open(CSV_FILE, 'w', encoding='utf-8', newline='',
+                  buffering=IO_BUFFER_SIZE) as f:
+            f.write(buffer.getvalue())
         print(f"✅ Dane zapisane do {CSV_FILE}")
+        
+        after_save()
     except Exception as e:
         print(f"❌ Błąd podczas zapisywania pliku CSV: {e}")
         print(f"   Upewnij się, że masz uprawnienia do zapisu w tym katalogu.")
 
 
+def append_last_row(coupons: Coupons) -> None:
+    """
+    Zapisuje nowo dopisany (ostatni) kupon, dopisując jeden wiersz na końcu
+    pliku CSV zamiast przepisywać cały plik.
+    
+    Dopisanie kuponu nie zmienia wcześniejszych wierszy (sumy są narastające),
+    ale jest możliwe tylko wtedy, gdy plik nie zmienił się od ostatniego
+    save_rows - w przeciwnym razie (np. plik dopiero wczytany albo edytowany
+    ręcznie) zapisywany jest cały plik.
+    
+    Args:
+        coupons: Kupony z aktualnymi agregatami (nowy kupon na końcu).
+    """
+    try:
+        unchanged = (_saved_file_key is not None
+                     and csv_file_key(os.stat(CSV_FILE)) == _saved_file_key)
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        save_rows(coupons)
+        return
+    
+    try:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(format_rows(coupons, len(coupons) - 1))
+        
+        with open(CSV_FILE, 'a', encoding='utf-8', newline='') as f:
+            f.write(buffer.getvalue())
+        print(f"✅ Dane zapisane do {CSV_FILE}")
+        
+        after_save()
+    except Exception as e:
+        print(f"❌ Błąd podczas zapisywania pliku CSV: {e}")
+        print(f"   Upewnij się, że masz uprawnienia do zapisu w tym katalogu.")
+
+
+def after_save() -> None:
+    """
+    Zapamiętuje wersję właśnie zapisanego pliku CSV (patrz append_last_row).
+    """
+    global _saved_file_key
+    
+    _saved_file_key = csv_file_key(os.stat(CSV_FILE))
+
+
+def csv_file_key(stat: os.stat_result) -> Tuple[int, int]:
+    """
+    Klucz wersji pliku CSV - data modyfikacji (ns) i rozmiar.
+    
+    Args:
+        stat: Wynik os.stat/os.fstat dla pliku CSV.
+    
+    Returns:
+        Krotka (mtime_ns, rozmiar).
+    """
+    return (stat.st_mtime_ns, stat.st_size)
+
+
 # ============================================================================
 # FUNKCJE POMOCNICZE - PARSOWANIE I WALIDACJA
 # ============================================================================
 
-def parse_float(s: str) -> Optional[float]:
+@lru_cache(maxsize=4096)
+def format_odds(odds: float) -> str:
     """
-    Parsuje string do float, obsługując polski separator (przecinek).
+    Formatuje kurs jako tekst - z 2 miejscami po przecinku, a jeśli kurs ma
+    ich więcej (np. 3.958 z pliku), z pełną dokładnością.
+    
+    Zapis pliku nie może zaokrąglać kursu - wygrana brutto po ponownym
+    wczytaniu byłaby inna niż zapisana.
     
     Args:
-        s: String do sparsowania.
-        
+        odds: Kurs.
+    
     Returns:
-        Wartość float lub None jeśli parsowanie się nie powiodło.
+        Sformatowany string, np. "2.50" lub "3.958".
     """
-    try:
-        # Zamień przecinek na kropkę
-        normalized = s.strip().replace(',', '.')
-        return float(normalized)
-    except (ValueError, AttributeError):
-        return None
+    text = "%.2f" % odds
+    if float(text) == odds:
+        return text
+    return repr(odds)
 
 
 def ask_float(prompt: str, min_value: Optional[float] = None, 
@@ -213,7 +487,7 @@ def ask_yes_no(prompt: str) -> bool:
 # FUNKCJE POMOCNICZE - LOGIKA BIZNESOWA
 # ============================================================================
 
-def recompute_aggregates(rows: List[Dict[str, str]]) -> None:
+def recompute_aggregates(coupons: Coupons) -> Dict[str, float]:
     """
     Przelicza i aktualizuje agregaty dla wszystkich kuponów:
     - Suma zasieleń (całkowity wkład kapitału)
@@ -225,85 +499,133 @@ def recompute_aggregates(rows: List[Dict[str, str]]) -> None:
     Kupony z statusem OCZEKUJE nie wpływają na łączne wygrane przy liczeniu salda,
     ale ich wygrana brutto jest wyliczana (jako potencjalna).
     
+    Przy okazji wylicza sumy rozstrzygniętych kuponów, więc od razu zwraca
+    bieżący stan gry - bez osobnego przejścia w get_current_status.
+    
     Args:
-        rows: Lista kuponów do przeliczenia (modyfikowana in-place).
+        coupons: Kupony do przeliczenia (kolumny agregatów są nadpisywane).
+    
+    Returns:
+        Bieżący stan gry (jak get_current_status).
+    """
+    statuses = coupons.statuses
+    
+    # Wygrana brutto (dla OCZEKUJE - potencjalna), zaokrąglona do grosza
+    # tak samo jak w aplikacji Streamlit
+    gross_wins = list(map(gross_cents, coupons.odds, coupons.stakes))
+    
+    # Do sumy wygranych wchodzą tylko kupony WYGRANA
+    # (OCZEKUJE i PRZEGRANA nie dodają nic)
+    settled_wins = [gross if status == STATUS_WIN else 0
+                    for status, gross in zip(statuses, gross_wins)]
+    
+    # Sumy narastające (prefix sums)
+    coupons.sum_deposits = list(accumulate(coupons.deposits))
+    coupons.sum_stakes = list(accumulate(coupons.stakes))
+    coupons.gross_wins = gross_wins
+    
+    # Saldo = suma wygranych - suma stawek
+    # Dla kuponu OCZEKUJE pokazujemy potencjalne saldo (z jego wygraną brutto)
+    sum_wins_col = list(accumulate(settled_wins))
+    coupons.balances = [
+        sum_wins + gross - sum_stakes if status == STATUS_PENDING else sum_wins - sum_stakes
+        for status, gross, sum_wins, sum_stakes
+        in zip(statuses, gross_wins, sum_wins_col, coupons.sum_stakes)
+    ]
+    
+    # Sumy dla get_current_status - bez ponownego przechodzenia po kuponach
+    coupons.settled_stakes = sum(stake for status, stake in zip(statuses, coupons.stakes)
+                                 if status == STATUS_WIN or status == STATUS_LOSS)
+    coupons.settled_wins = sum_wins_col[-1] if sum_wins_col else 0
+    coupons.aggregates_ready = True
+    
+    return get_current_status(coupons)
+
+
+def append_pending_coupon(coupons: Coupons, number: str, stake: int,
+                          odds: float, deposit: int) -> None:
     """
-    sum_deposits = 0.0      # Suma zasieleń (kapitał)
-    sum_stakes = 0.0        # Suma wszystkich stawek (włącznie z oczekującymi)
-    sum_wins_settled = 0.0  # Suma wygranych tylko z rozstrzygniętych kuponów
+    Dopisuje nowy kupon OCZEKUJE i wylicza jego agregaty w O(1)
+    na podstawie agregatów poprzedniego kuponu.
     
-    for row in rows:
-        stake = parse_float(row["Stawka (S)"]) or 0.0
-        odds = parse_float(row["Kurs"]) or 0.0
-        result = row["Wynik"].strip().upper()
-        
-        # Zasilenie dla tego kuponu (może być 0.00 jeśli nie było zasilenia)
-        deposit = parse_float(row.get("Zasilenie", "0")) or 0.0
-        sum_deposits += deposit
-        row["Zasilenie"] = f"{deposit:.2f}"
-        row["Suma zasieleń"] = f"{sum_deposits:.2f}"
-        
-        # Aktualizuj sumę włożoną (stawek)
-        sum_stakes += stake
-        row["Suma włożona do tej pory"] = f"{sum_stakes:.2f}"
-        
-        # Wylicz wygraną brutto
-        gross_win = odds * stake
-        row["Wygrana brutto"] = f"{gross_win:.2f}"
-        
-        # Jeśli kupon rozstrzygnięty, uwzględnij w sumie wygranych
-        if result == "WYGRANA":
-            sum_wins_settled += gross_win
-        elif result == "PRZEGRANA":
-            pass  # Wygrana = 0, już uwzględnione
-        # OCZEKUJE - nie dodawaj do sum_wins_settled
-        
-        # Wylicz saldo (suma wygranych - suma stawek)
-        # Dla kuponu OCZEKUJE pokazujemy potencjalne saldo
-        if result == "OCZEKUJE":
-            potential_balance = sum_wins_settled + gross_win - sum_stakes
-            row["Saldo"] = f"{potential_balance:.2f}"
-            # Zysk netto = saldo (bo wkład jest oddzielnie śledzony w zasileniach)
-            row["Zysk netto"] = f"{potential_balance:.2f}"
-        else:
-            # Rzeczywiste saldo po rozstrzygnięciu
-            actual_balance = sum_wins_settled - sum_stakes
-            row["Saldo"] = f"{actual_balance:.2f}"
-            # Zysk netto = saldo (bo wkład jest oddzielnie śledzony w zasileniach)
-            row["Zysk netto"] = f"{actual_balance:.2f}"
+    Wcześniejsze kupony się nie zmieniają (sumy są narastające), więc pełne
+    recompute_aggregates nie jest potrzebne.
+    
+    Args:
+        coupons: Kupony z aktualnymi agregatami.
+        number: Numer nowego kuponu.
+        stake: Stawka w groszach.
+        odds: Kurs podany przez użytkownika (zaokrąglany do 0.01).
+        deposit: Zasilenie przy tym kuponie w groszach.
+    """
+    # Nowy kurs wpisany w konsoli jest zaokrąglany do 0.01 od razu przy
+    # utworzeniu kuponu - agregaty w pamięci i w pliku liczone są z tego
+    # samego kursu (kursy wczytane z pliku zostają bez zmian)
+    odds = float(f"{odds:.2f}")
+    
+    prev_deposits = coupons.sum_deposits[-1] if coupons else 0
+    prev_stakes = coupons.sum_stakes[-1] if coupons else 0
+    
+    coupons.append(number, "OCZEKUJE", stake, odds, deposit)
+    
+    gross_win = gross_cents(odds, stake)
+    sum_stakes = prev_stakes + stake
+    coupons.sum_deposits[-1] = prev_deposits + deposit
+    coupons.sum_stakes[-1] = sum_stakes
+    coupons.gross_wins[-1] = gross_win
+    # Potencjalne saldo - kupon OCZEKUJE nie zmienia sum rozstrzygniętych
+    coupons.balances[-1] = coupons.settled_wins + gross_win - sum_stakes
+    coupons.aggregates_ready = True
 
 
-def get_current_status(rows: List[Dict[str, str]]) -> Dict[str, float]:
+def settle_last_coupon(coupons: Coupons, result: str) -> Dict[str, float]:
     """
-    Oblicza bieżący stan gry na podstawie rozstrzygniętych kuponów.
+    Rozstrzyga ostatni kupon (OCZEKUJE) i aktualizuje agregaty w O(1).
+    
+    Zmienia się tylko saldo ostatniego kuponu i sumy rozstrzygniętych,
+    wcześniejsze kupony zostają bez zmian.
     
     Args:
-        rows: Lista wszystkich kuponów.
-        
+        coupons: Kupony z aktualnymi agregatami (ostatni ma status OCZEKUJE).
+        result: Wynik - WYGRANA lub PRZEGRANA.
+    
     Returns:
-        Słownik z kluczami: sum_deposits, sum_stakes, sum_wins, balance, net_profit, target.
+        Bieżący stan gry po rozstrzygnięciu.
     """
-    sum_deposits = 0.0  # Suma zasieleń (całkowity wkład)
-    sum_stakes = 0.0    # Suma stawek
-    sum_wins = 0.0      # Suma wygranych
+    idx = len(coupons) - 1
+    coupons.set_result(idx, result)
     
-    for row in rows:
-        result = row["Wynik"].strip().upper()
-        
-        # Suma zasieleń zawsze (niezależnie od statusu)
-        deposit = parse_float(row.get("Zasilenie", "0")) or 0.0
-        sum_deposits += deposit
-        
-        # Uwzględnij tylko rozstrzygnięte kupony dla stawek i wygranych
-        if result in ["WYGRANA", "PRZEGRANA"]:
-            stake = parse_float(row["Stawka (S)"]) or 0.0
-            sum_stakes += stake
-            
-            if result == "WYGRANA":
-                odds = parse_float(row["Kurs"]) or 0.0
-                sum_wins += odds * stake
+    if coupons.statuses[idx] == STATUS_WIN:
+        coupons.settled_wins += coupons.gross_wins[idx]
+    coupons.settled_stakes += coupons.stakes[idx]
+    coupons.balances[idx] = coupons.settled_wins - coupons.sum_stakes[idx]
+    coupons.aggregates_ready = True
     
-    balance = sum_wins - sum_stakes  # Saldo (suma wygranych - suma stawek)
+    return get_current_status(coupons)
+
+
+def get_current_status(coupons: Coupons) -> Dict[str, float]:
+    """
+    Oblicza bieżący stan gry na podstawie rozstrzygniętych kuponów.
+    
+    Korzysta z agregatów wyliczonych przez recompute_aggregates,
+    więc nie przechodzi ponownie po wszystkich kuponach.
+    
+    Args:
+        coupons: Wszystkie kupony (z aktualnymi agregatami).
+        
+    Returns:
+        Słownik z kluczami: sum_deposits, sum_stakes, sum_wins, balance, net_profit, target
+        (kwoty w złotych).
+    """
+    # Suma zasieleń zawsze (niezależnie od statusu)
+    sum_deposits = (coupons.sum_deposits[-1] if coupons else 0) / 100
+    # Stawki i wygrane tylko z rozstrzygniętych kuponów
+    sum_stakes = coupons.settled_stakes / 100
+    sum_wins = coupons.settled_wins / 100
+    
+    # Saldo (suma wygranych - suma stawek) - różnica liczona dokładnie w groszach
+    balance = (coupons.settled_wins - coupons.settled_stakes) / 100
     budget = sum_deposits + balance  # Budżet (dostępne środki = wkład + saldo)
     net_profit = balance  # Zysk netto = saldo (bo wkład jest osobno)
     target = sum_deposits + PROFIT_TARGET  # Cel: wkład + 100 zł
@@ -346,23 +668,24 @@ def recommend_stake(budget: float, target: float, odds: float) -> float:
     if budget >= target:
         raise ValueError("Budżet już osiągnął cel - nie potrzebujesz kolejnej stawki")
     
-    needed = target - budget
-    required_stake = needed / (odds - 1)
+    # Brakująca kwota w groszach - bez błędu float przy mnożeniu przez 100
+    needed = to_cents(target) - to_cents(budget)
     
-    # Zaokrąglij w górę do 2 miejsc po przecinku
-    recommended = math.ceil(required_stake * 100) / 100
+    # Zaokrąglij w górę do pełnego grosza
+    recommended = math.ceil(needed / (odds - 1))
     
-    return recommended
+    return recommended / 100
 
 
-def print_summary(rows: List[Dict[str, str]]) -> None:
+def print_summary(coupons: Coupons, start: int = 0) -> None:
     """
-    Wyświetla czytelne podsumowanie wszystkich kuponów.
+    Wyświetla czytelne podsumowanie kuponów.
     
     Args:
-        rows: Lista kuponów do wyświetlenia.
+        coupons: Kupony do wyświetlenia.
+        start: Indeks pierwszego wyświetlanego kuponu (domyślnie wszystkie).
     """
-    if not rows:
+    if not coupons:
         print("\n📋 Baza kuponów jest pusta.")
         return
     
@@ -370,43 +693,32 @@ def print_summary(rows: List[Dict[str, str]]) -> None:
     print("📋 PODSUMOWANIE KUPONÓW")
     print("="*80)
     
-    for row in rows:
-        kupon_nr = row["Kupon"]
-        wynik = row["Wynik"]
-        stawka = row["Stawka (S)"]
-        kurs = row["Kurs"]
-        zasilenie = row.get("Zasilenie", "0.00")
-        suma_zasielen = row.get("Suma zasieleń", "0.00")
-        suma_wlozona = row["Suma włożona do tej pory"]
-        wygrana = row["Wygrana brutto"]
-        saldo = row.get("Saldo", row.get("Zysk/Strata po kuponie", "0.00"))
-        zysk_netto = row.get("Zysk netto", "0.00")
-        
+    # Wszystkie pola kuponu rozpakowane naraz z kolumn (bez indeksowania)
+    columns = (coupons.numbers, coupons.results, coupons.statuses, coupons.odds,
+               coupons.stakes, coupons.deposits, coupons.sum_deposits,
+               coupons.sum_stakes, coupons.gross_wins, coupons.balances)
+    
+    for (kupon_nr, wynik, status, kurs, stawka, zasilenie, suma_zasielen,
+         suma_stawek, wygrana, saldo) in zip(*(islice(col, start, None) for col in columns)):
         # Ikonka statusu
-        if wynik == "WYGRANA":
-            status_icon = "✅"
-        elif wynik == "PRZEGRANA":
-            status_icon = "❌"
-        else:
-            status_icon = "⏳"
+        status_icon = STATUS_ICONS.get(status, "⏳")
         
         print(f"\n{status_icon} Kupon #{kupon_nr} - {wynik}")
         
         # Pokaż zasilenie jeśli było
-        deposit_val = parse_float(zasilenie) or 0.0
-        if deposit_val > 0:
-            print(f"   💵 Zasilenie: +{zasilenie} zł  →  Suma wkładu: {suma_zasielen} zł")
+        if zasilenie > 0:
+            print(f"   💵 Zasilenie: +{format_cents(zasilenie)} zł  →  Suma wkładu: {format_cents(suma_zasielen)} zł")
         
-        print(f"   Kurs: {kurs}  |  Stawka: {stawka} zł")
-        print(f"   Suma stawek: {suma_wlozona} zł  |  Wygrana brutto: {wygrana} zł")
+        print(f"   Kurs: {format_odds(kurs)}  |  Stawka: {format_cents(stawka)} zł")
+        print(f"   Suma stawek: {format_cents(suma_stawek)} zł  |  Wygrana brutto: {format_cents(wygrana)} zł")
         
-        saldo_val = parse_float(saldo) or 0.0
-        zysk_val = parse_float(zysk_netto) or 0.0
-        
-        if wynik == "OCZEKUJE":
-            print(f"   Potencjalne saldo: {saldo} zł  |  Potencjalny zysk netto: {format_currency(zysk_val)}")
+        # Zysk netto = saldo (bo wkład jest oddzielnie śledzony w zasileniach)
+        saldo_str = format_cents(saldo)
+        zysk_str = saldo_str if saldo < 0 else "+" + saldo_str
+        if status == STATUS_PENDING:
+            print(f"   Potencjalne saldo: {saldo_str} zł  |  Potencjalny zysk netto: {zysk_str} zł")
         else:
-            print(f"   Saldo: {saldo} zł  |  Zysk netto: {format_currency(zysk_val)}")
+            print(f"   Saldo: {saldo_str} zł  |  Zysk netto: {zysk_str} zł")
     
     print("="*80 + "\n")
 
@@ -421,22 +733,20 @@ def format_currency(amount: float) -> str:
     Returns:
         Sformatowany string, np. "+123.45 zł" lub "-67.89 zł".
     """
-    if amount >= 0:
-        return f"+{amount:.2f} zł"
-    else:
-        return f"{amount:.2f} zł"
+    # Specyfikator "+" sam dodaje znak (w pętlach używamy go bezpośrednio)
+    return f"{amount:+.2f} zł"
 
 
 # ============================================================================
 # FUNKCJE GŁÓWNEJ LOGIKI APLIKACJI
 # ============================================================================
 
-def create_first_coupon() -> List[Dict[str, str]]:
+def create_first_coupon() -> Coupons:
     """
     Obsługuje tworzenie pierwszego kuponu w pustej bazie.
     
     Returns:
-        Lista z jednym kuponem o statusie OCZEKUJE.
+        Kupony z jednym kuponem o statusie OCZEKUJE.
     """
     print("\n" + "="*80)
     print("🎯 TWORZENIE PIERWSZEGO KUPONU")
@@ -446,79 +756,70 @@ def create_first_coupon() -> List[Dict[str, str]]:
     deposit = ask_float("Ile pieniędzy wpłacasz na start (zasilenie)? ", min_value=0.0)
     
     print(f"\n✅ Zasilenie: {deposit:.2f} zł")
-    print(f"🎯 Cel: odzyskać wkład + {PROFIT_TARGET:.2f} zł zysku = {deposit + PROFIT_TARGET:.2f} zł")
+    print(f"🎯 Cel: odzyskać wkład + {PROFIT_TARGET_STR} zł zysku = {deposit + PROFIT_TARGET:.2f} zł")
     
     odds = ask_float("\nPodaj kurs pierwszego kuponu (np. 2.5): ", min_value=1.0)
     stake = ask_float("Podaj stawkę (np. 10): ", min_value=0.0)
     
     # Utwórz pierwszy kupon
-    coupon = {
-        "Kupon": "1",
-        "Wynik": "OCZEKUJE",
-        "Stawka (S)": f"{stake:.2f}",
-        "Kurs": f"{odds:.2f}",
-        "Zasilenie": f"{deposit:.2f}",
-        "Suma zasieleń": "0.00",  # Zostanie przeliczone
-        "Suma włożona do tej pory": "0.00",  # Zostanie przeliczone
-        "Wygrana brutto": "0.00",  # Zostanie przeliczone
-        "Saldo": "0.00",  # Zostanie przeliczone
-        "Zysk netto": "0.00"  # Zostanie przeliczone
-    }
+    coupons = Coupons()
+    append_pending_coupon(coupons, "1", to_cents(stake), odds, to_cents(deposit))
     
-    rows = [coupon]
-    recompute_aggregates(rows)
-    save_rows(rows)
-    print_summary(rows)
+    save_rows(coupons)
+    print_summary(coupons)
     
     print(f"\n✨ Utworzono pierwszy kupon. Uruchom program ponownie, aby rozstrzygnąć wynik.")
     
-    return rows
+    return coupons
 
 
-def settle_pending_coupon(rows: List[Dict[str, str]], last_idx: int) -> None:
+def settle_pending_coupon(coupons: Coupons, last_idx: int) -> Dict[str, float]:
     """
     Rozstrzyga kupon o statusie OCZEKUJE.
     
     Args:
-        rows: Lista wszystkich kuponów.
+        coupons: Wszystkie kupony.
         last_idx: Indeks ostatniego kuponu (który jest OCZEKUJE).
-    """
-    last_coupon = rows[last_idx]
     
+    Returns:
+        Bieżący stan gry po rozstrzygnięciu.
+    """
     print("\n" + "="*80)
-    print(f"⏳ Kupon #{last_coupon['Kupon']} oczekuje na rozstrzygnięcie")
+    print(f"⏳ Kupon #{coupons.numbers[last_idx]} oczekuje na rozstrzygnięcie")
     print("="*80)
-    print(f"   Kurs: {last_coupon['Kurs']}")
-    print(f"   Stawka: {last_coupon['Stawka (S)']} zł")
-    print(f"   Potencjalna wygrana: {last_coupon['Wygrana brutto']} zł")
+    print(f"   Kurs: {format_odds(coupons.odds[last_idx])}")
+    print(f"   Stawka: {format_cents(coupons.stakes[last_idx])} zł")
+    print(f"   Potencjalna wygrana: {format_cents(coupons.gross_wins[last_idx])} zł")
     
     while True:
         result = input("\nJaki jest wynik tego kuponu? (W - wygrana / P - przegrana): ").strip().upper()
         
         if result in ['W', 'WYGRANA']:
-            last_coupon["Wynik"] = "WYGRANA"
+            status = settle_last_coupon(coupons, "WYGRANA")
             break
         elif result in ['P', 'PRZEGRANA']:
-            last_coupon["Wynik"] = "PRZEGRANA"
-            last_coupon["Wygrana brutto"] = "0.00"  # Przegrana = 0 wygranej
+            status = settle_last_coupon(coupons, "PRZEGRANA")
             break
         else:
             print("❌ Nieprawidłowa odpowiedź. Wpisz 'W' (wygrana) lub 'P' (przegrana).")
     
-    # Przelicz agregaty po rozstrzygnięciu
-    recompute_aggregates(rows)
-    save_rows(rows)
+    # Agregaty są już aktualne (settle_last_coupon), zostaje tylko zapis.
+    # Zapisujemy od razu - rozstrzygnięcie nie może przepaść, jeśli
+    # użytkownik przerwie dodawanie kolejnego kuponu.
+    save_rows(coupons)
     
-    print(f"\n✅ Kupon #{last_coupon['Kupon']} rozstrzygnięty jako {last_coupon['Wynik']}.")
+    print(f"\n✅ Kupon #{coupons.numbers[last_idx]} rozstrzygnięty jako {coupons.results[last_idx]}.")
+    
+    return status
 
 
-def add_new_coupon_with_recommendation(rows: List[Dict[str, str]], 
+def add_new_coupon_with_recommendation(coupons: Coupons, 
                                        status: Dict[str, float]) -> None:
     """
     Dodaje nowy kupon z rekomendacją stawki (gdy net_profit < PROFIT_TARGET).
     
     Args:
-        rows: Lista wszystkich kuponów.
+        coupons: Wszystkie kupony.
         status: Bieżący stan gry (sum_deposits, balance, budget, net_profit, target, itp.).
     """
     print("\n" + "="*80)
@@ -535,7 +836,7 @@ def add_new_coupon_with_recommendation(rows: List[Dict[str, str]],
     print(f"💰 Saldo (wygrane - stawki): {format_currency(balance)}")
     print(f"💳 Budżet (dostępne środki): {budget:.2f} zł")
     print(f"📈 Zysk netto: {format_currency(net_profit)}")
-    print(f"🎯 Cel: {target:.2f} zł (wkład + {PROFIT_TARGET:.2f} zł)")
+    print(f"🎯 Cel: {target:.2f} zł ({TARGET_LABEL})")
     print(f"📊 Do celu brakuje: {format_currency(target - budget)}")
     
     # Sprawdź czy grasz wkładem czy zyskiem
@@ -615,24 +916,11 @@ def add_new_coupon_with_recommendation(rows: List[Dict[str, str]],
         return
     
     # Utwórz nowy kupon
-    next_number = max(int(row["Kupon"]) for row in rows) + 1
-    
-    new_coupon = {
-        "Kupon": str(next_number),
-        "Wynik": "OCZEKUJE",
-        "Stawka (S)": f"{stake:.2f}",
-        "Kurs": f"{odds:.2f}",
-        "Zasilenie": f"{deposit:.2f}",
-        "Suma zasieleń": "0.00",  # Zostanie przeliczone
-        "Suma włożona do tej pory": "0.00",  # Zostanie przeliczone
-        "Wygrana brutto": "0.00",  # Zostanie przeliczone
-        "Saldo": "0.00",  # Zostanie przeliczone
-        "Zysk netto": "0.00"  # Zostanie przeliczone
-    }
+    next_number = coupons.max_number + 1
     
-    rows.append(new_coupon)
-    recompute_aggregates(rows)
-    save_rows(rows)
+    append_pending_coupon(coupons, str(next_number), to_cents(stake), odds,
+                          to_cents(deposit))
+    append_last_row(coupons)
     
     print(f"\n✅ Dodano kupon #{next_number} ze stawką {stake:.2f} zł")
     
@@ -640,16 +928,16 @@ def add_new_coupon_with_recommendation(rows: List[Dict[str, str]],
     new_budget = budget - stake
     print(f"💳 Budżet po tej stawce: {new_budget:.2f} zł")
     
-    print_summary([new_coupon])
+    print_summary(coupons, start=len(coupons) - 1)
 
 
-def add_new_coupon_without_recommendation(rows: List[Dict[str, str]]) -> None:
+def add_new_coupon_without_recommendation(coupons: Coupons) -> None:
     """
     Dodaje nowy kupon bez rekomendacji (gdy net_profit >= PROFIT_TARGET).
     Użytkownik sam decyduje o kursie i stawce.
     
     Args:
-        rows: Lista wszystkich kuponów.
+        coupons: Wszystkie kupony.
     """
     print("\n" + "="*80)
     print("🎲 DODAWANIE NOWEGO KUPONU (bez rekomendacji)")
@@ -667,27 +955,14 @@ def add_new_coupon_without_recommendation(rows: List[Dict[str, str]]) -> None:
     stake = ask_float("Podaj stawkę: ", min_value=0.0)
     
     # Utwórz nowy kupon
-    next_number = max(int(row["Kupon"]) for row in rows) + 1
-    
-    new_coupon = {
-        "Kupon": str(next_number),
-        "Wynik": "OCZEKUJE",
-        "Stawka (S)": f"{stake:.2f}",
-        "Kurs": f"{odds:.2f}",
-        "Zasilenie": f"{deposit:.2f}",
-        "Suma zasieleń": "0.00",  # Zostanie przeliczone
-        "Suma włożona do tej pory": "0.00",  # Zostanie przeliczone
-        "Wygrana brutto": "0.00",  # Zostanie przeliczone
-        "Saldo": "0.00",  # Zostanie przeliczone
-        "Zysk netto": "0.00"  # Zostanie przeliczone
-    }
+    next_number = coupons.max_number + 1
     
-    rows.append(new_coupon)
-    recompute_aggregates(rows)
-    save_rows(rows)
+    append_pending_coupon(coupons, str(next_number), to_cents(stake), odds,
+                          to_cents(deposit))
+    append_last_row(coupons)
     
     print(f"\n✅ Dodano kupon #{next_number}")
-    print_summary([new_coupon])
+    print_summary(coupons, start=len(coupons) - 1)
 
 
 # ============================================================================
@@ -706,31 +981,38 @@ def main():
     print("="*80)
     
     # Wczytaj bazę
-    rows = load_rows()
+    coupons = load_rows()
+    
+    # Błąd odczytu - plik zostaje nietknięty (nie traktujemy go jak pustej bazy)
+    if coupons is None:
+        print(f"   Popraw plik {CSV_FILE} i uruchom program ponownie.")
+        return
     
     # Jeśli baza pusta, utwórz pierwszy kupon
-    if not rows:
+    if not coupons:
         print("\n📋 Baza kuponów jest pusta.")
         create_first_coupon()
         return
     
-    # Przelicz agregaty (na wypadek ręcznej edycji pliku)
-    recompute_aggregates(rows)
+    # Przelicz agregaty (na wypadek ręcznej edycji pliku) - chyba że są
+    # już aktualne (np. po migracji, która sama je przelicza).
+    # Stan gry (tylko rozstrzygnięte kupony) wychodzi z tego samego przejścia.
+    if coupons.aggregates_ready:
+        status = get_current_status(coupons)
+    else:
+        status = recompute_aggregates(coupons)
     
     # Wyświetl podsumowanie
-    print_summary(rows)
+    print_summary(coupons)
     
     # Sprawdź ostatni kupon
-    last_coupon = rows[-1]
-    last_idx = len(rows) - 1
+    last_idx = len(coupons) - 1
     
     # Jeśli ostatni kupon oczekuje, rozstrzygnij go
-    if last_coupon["Wynik"].strip().upper() == "OCZEKUJE":
-        settle_pending_coupon(rows, last_idx)
-        print_summary(rows)
+    if coupons.statuses[last_idx] == STATUS_PENDING:
+        status = settle_pending_coupon(coupons, last_idx)
+        print_summary(coupons)
     
-    # Oblicz bieżący stan gry (tylko rozstrzygnięte kupony)
-    status = get_current_status(rows)
     balance = status["balance"]
     budget = status["budget"]
     net_profit = status["net_profit"]
@@ -746,7 +1028,7 @@ def main():
     print(f"📊 Saldo (wygrane - stawki): {format_currency(balance)}")
     print(f"💳 Budżet (dostępne środki): {budget:.2f} zł")
     print(f"📈 Zysk netto: {format_currency(net_profit)}")
-    print(f"🎯 Cel: {target:.2f} zł (wkład + {PROFIT_TARGET:.2f} zł)")
+    print(f"🎯 Cel: {target:.2f} zł ({TARGET_LABEL})")
     
     # Status: grasz wkładem czy zyskiem?
     if balance < 0:
@@ -762,18 +1044,18 @@ def main():
     if net_profit >= PROFIT_TARGET:
         print(f"\n🎉 GRATULACJE! Osiągnąłeś cel!")
         print(f"   Zysk netto: {format_currency(net_profit)}")
-        print(f"   (odzyskałeś cały wkład + {PROFIT_TARGET:.2f} zł zysku)")
+        print(f"   (odzyskałeś cały wkład + {PROFIT_TARGET_STR} zł zysku)")
         print(f"   Nie proponuję kolejnej stawki.")
         
         add_another = ask_yes_no("\n❓ Chcesz dodać kolejny kupon? (t/n): ")
         
         if add_another:
-            add_new_coupon_without_recommendation(rows)
+            add_new_coupon_without_recommendation(coupons)
         else:
             print("\n👋 Dziękuję za skorzystanie z aplikacji!")
     else:
         # net_profit < PROFIT_TARGET, dodaj kupon z rekomendacją
-        add_new_coupon_with_recommendation(rows, status)
+        add_new_coupon_with_recommendation(coupons, status)
 
 
 # ============================================================================
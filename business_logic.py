@@ -8,7 +8,13 @@ Zawiera funkcje do obliczania stawek, statusu gry i rekomendacji.
 
 import math
 import os
-from typing import List, Dict, Optional
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from itertools import accumulate, compress
+from typing import Iterable, List, Dict, Optional, Tuple, Union
 
 
 # ============================================================================
@@ -17,29 +23,154 @@ from typing import List, Dict, Optional
 
 PROFIT_TARGET = 100.0  # Docelowy zysk netto (może być dynamicznie zmieniany)
 
+# Nazwy kolumn używane w obliczeniach - jeden obiekt str na klucz,
+# wczytany raz do zmiennej lokalnej w gorących pętlach
+COL_NUMBER = "Kupon"
+COL_NAME = "Nazwa"
+COL_RESULT = "Wynik"
+COL_STAKE = "Stawka (S)"
+COL_ODDS = "Kurs"
+COL_DEPOSIT = "Zasilenie"
+COL_SUM_DEPOSITS = "Suma zasieleń"
+COL_SUM_STAKES = "Suma włożona do tej pory"
+COL_GROSS_WIN = "Wygrana brutto"
+COL_BALANCE = "Saldo"
+COL_NET_PROFIT = "Zysk netto"
+
+# Kanoniczne wartości kolumny Wynik (tak zapisuje je aplikacja) - dla nich
+# normalizacja to jedno wyszukanie w słowniku, bez strip()/upper()
+_CANONICAL_RESULTS = {value: value for value in ("WYGRANA", "PRZEGRANA", "OCZEKUJE", "")}
+# Wyniki kuponu oczekującego (pusty - stare rekordy bez Wynik)
+_PENDING_RESULTS = frozenset({"OCZEKUJE", ""})
+# Jednostka do zaokrąglania iloczynów Decimal do pełnego grosza
+_ONE = Decimal(1)
+
+# Wersja danych kuponów - zwiększana przy każdej zmianie wierszy
+# (recompute_aggregates i funkcje modyfikujące). Unieważnia zapamiętane wyniki.
+_rows_version = 0
+
+# Docelowy zysk wczytany z pliku, z kluczem (mtime_ns, rozmiar) pliku -
+# plik jest czytany ponownie tylko po zmianie (także zewnętrznej)
+PROFIT_TARGET_FILE = 'profit_target.txt'
+_profit_target_cache: Optional[Tuple[Tuple[int, int], float]] = None
+
 
 # ============================================================================
 # FUNKCJE POMOCNICZE - PARSOWANIE I WALIDACJA
 # ============================================================================
 
+@lru_cache(maxsize=8192)
 def parse_float(s: str) -> Optional[float]:
     """
     Parsuje string do float, obsługując polski separator (przecinek).
     
+    Wyniki są zapamiętywane - przy każdym przeliczeniu parsowane są te same
+    teksty (np. "0.00", "1.00", powtarzające się stawki).
+    
     Args:
         s: String do sparsowania.
         
     Returns:
         Wartość float lub None jeśli parsowanie się nie powiodło.
     """
+    # Puste pole (częste w kolumnach Stawka/Zasilenie) - bez kosztownego
+    # rzucania i łapania wyjątku
+    if s is None or s == '':
+        return None
+    
     try:
-        # Zamień przecinek na kropkę
-        normalized = s.strip().replace(',', '.')
-        return float(normalized)
-    except (ValueError, AttributeError):
+        # float() sam pomija białe znaki, więc wystarczy zamienić przecinek
+        # na kropkę - i tylko wtedy, gdy faktycznie występuje w tekście
+        if ',' in s:
+            s = s.replace(',', '.')
+        return float(s)
+    except (ValueError, TypeError, AttributeError):
         return None
 
 
+def normalize_result(value: Optional[str]) -> str:
+    """
+    Sprowadza wartość kolumny Wynik do postaci kanonicznej (strip + upper).
+    
+    Wartości już kanoniczne są zwracane bez tworzenia nowych stringów,
+    pozostałe są normalizowane i internowane.
+    
+    Args:
+        value: Wartość z kolumny Wynik (może być None).
+    
+    Returns:
+        Znormalizowany wynik, np. "WYGRANA" albo "" dla braku wartości.
+    """
+    canonical = _CANONICAL_RESULTS.get(value)
+    if canonical is not None:
+        return canonical
+    return sys.intern((value or "").strip().upper())
+
+
+def to_cents(amount: float) -> int:
+    """
+    Zamienia kwotę w złotych na grosze.
+    
+    Args:
+        amount: Kwota w złotych.
+    
+    Returns:
+        Kwota w groszach (zaokrąglona do pełnego grosza).
+        Wartości nieskończone/NaN (np. "inf" w pliku) dają 0.
+    """
+    if not math.isfinite(amount):
+        return 0
+    return round(amount * 100)
+
+
+def gross_cents(odds: float, stake: int) -> int:
+    """
+    Liczy wygraną brutto (kurs * stawka) w groszach.
+    
+    Zaokrąglany jest tylko iloczyn - do pełnego grosza, połówki od zera
+    (28.325 -> 28.33). Kurs wchodzi do iloczynu dokładnie tak, jak jest
+    zapisany (np. 3.958), bez zaokrąglania do 0.01. Funkcja jest wspólna
+    z aplikacją konsolową (app.py), więc obie liczą te same kwoty.
+    
+    Args:
+        odds: Kurs.
+        stake: Stawka w groszach.
+    
+    Returns:
+        Wygrana brutto w groszach.
+        Kurs nieskończony/NaN (np. "inf" w pliku) daje 0.
+    """
+    if not math.isfinite(odds):
+        return 0
+    # Zwykły przypadek - kurs z co najwyżej 2 miejscami po przecinku,
+    # iloczyn liczony dokładnie na liczbach całkowitych
+    hundredths = round(odds * 100)
+    if hundredths / 100 == odds:
+        product = hundredths * stake
+        if product >= 0:
+            return (product + 50) // 100
+        return -((50 - product) // 100)
+    # Dokładniejszy kurs - iloczyn w Decimal z najkrótszego zapisu kursu
+    return int((Decimal(repr(odds)) * stake).quantize(_ONE, ROUND_HALF_UP))
+
+
+def format_cents(cents: int) -> str:
+    """
+    Formatuje kwotę w groszach jako tekst z 2 miejscami po przecinku.
+    
+    Args:
+        cents: Kwota w groszach.
+    
+    Returns:
+        Sformatowany string, np. "123.45" lub "-0.50".
+    """
+    # Jedno formatowanie "%" - ta funkcja jest wołana dla każdej kwoty
+    # w każdym przeliczonym wierszu
+    if cents >= 0:
+        return "%d.%02d" % (cents // 100, cents % 100)
+    return "-%d.%02d" % divmod(-cents, 100)
+
+
 def validate_odds(odds: float) -> bool:
     """
     Waliduje kurs.
@@ -66,6 +197,109 @@ def validate_stake(stake: float) -> bool:
     return stake > 0.0
 
 
+# ============================================================================
+# MODEL KOLUMNOWY
+# ============================================================================
+
+@dataclass
+class CouponTable:
+    """
+    Kolumnowy widok kuponów - osobna lista dla każdej kolumny wejściowej.
+    
+    Wiersze (słowniki tekstów) pozostają formatem wymiany z CSV i sesją;
+    tabela parsuje je raz, a funkcje liczące pracują na gotowych liczbach.
+    Wszystkie funkcje przyjmujące `rows` akceptują też CouponTable, więc
+    jedną tabelę można przekazać do kilku obliczeń.
+    """
+    numbers: List[str] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    results: List[str] = field(default_factory=list)  # Znormalizowane (strip + upper)
+    stakes: List[float] = field(default_factory=list)
+    odds: List[float] = field(default_factory=list)
+    deposits: List[float] = field(default_factory=list)
+    
+    def __len__(self) -> int:
+        return len(self.numbers)
+    
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, str]]) -> "CouponTable":
+        """
+        Buduje tabelę z listy wierszy.
+        
+        Jedno przejście po wierszach wyciąga potrzebne pola do krotek,
+        a zip(*) transponuje je na kolumny.
+        
+        Args:
+            rows: Lista kuponów (słowniki jak w CSV).
+        
+        Returns:
+            Tabela kolumnowa.
+        """
+        if not rows:
+            return cls()
+        
+        k_number, k_name, k_result = COL_NUMBER, COL_NAME, COL_RESULT
+        k_stake, k_odds, k_deposit = COL_STAKE, COL_ODDS, COL_DEPOSIT
+        numbers, names, results, stakes, odds, deposits = zip(*[
+            (row.get(k_number, ""), row.get(k_name, ""), row.get(k_result),
+             row.get(k_stake, "0"), row.get(k_odds, "0"), row.get(k_deposit, "0"))
+            for row in rows
+        ])
+        parse = parse_float  # Zmienna lokalna zamiast globalnej w pętlach
+        return cls(
+            numbers=list(numbers),
+            names=list(names),
+            results=list(map(normalize_result, results)),
+            stakes=[parse(stake) or 0.0 for stake in stakes],
+            odds=[parse(value) or 0.0 for value in odds],
+            deposits=[parse(deposit) or 0.0 for deposit in deposits]
+        )
+
+
+def as_table(rows: Union[List[Dict[str, str]], CouponTable]) -> CouponTable:
+    """
+    Zwraca tabelę kolumnową dla wierszy (lub samą tabelę, jeśli już nią jest).
+    
+    Kilka obliczeń na tych samych danych może dostać jedną tabelę zamiast
+    parsować wiersze osobno.
+    
+    Args:
+        rows: Lista kuponów albo gotowa CouponTable.
+    
+    Returns:
+        Tabela kolumnowa.
+    """
+    if isinstance(rows, CouponTable):
+        return rows
+    return CouponTable.from_rows(rows)
+
+
+def bump_rows_version() -> None:
+    """
+    Oznacza dane kuponów jako zmienione - unieważnia wyniki zapamiętane
+    z kluczem get_rows_version().
+    
+    Wywoływane automatycznie przez recompute_aggregates i funkcje
+    modyfikujące wiersze (delete_coupon, edit_coupon).
+    """
+    global _rows_version
+    _rows_version += 1
+
+
+def get_rows_version() -> int:
+    """
+    Zwraca bieżącą wersję danych kuponów.
+    
+    Wersja rośnie przy każdej zmianie wierszy (patrz bump_rows_version),
+    więc razem z tożsamością i długością listy może służyć jako klucz
+    pamięci podręcznej wyników zależnych od kuponów.
+    
+    Returns:
+        Numer wersji danych.
+    """
+    return _rows_version
+
+
 # ============================================================================
 # FUNKCJE LOGIKI BIZNESOWEJ
 # ============================================================================
@@ -85,88 +319,162 @@ def recompute_aggregates(rows: List[Dict[str, str]]) -> None:
     Args:
         rows: Lista kuponów do przeliczenia (modyfikowana in-place).
     """
-    sum_deposits = 0.0      # Suma zasieleń (kapitał)
-    sum_stakes = 0.0        # Suma wszystkich stawek (włącznie z oczekującymi)
-    sum_wins_settled = 0.0  # Suma wygranych tylko z rozstrzygniętych kuponów
+    update_from(rows, 0)
+
+
+def update_from(rows: List[Dict[str, str]], start: int) -> None:
+    """
+    Przelicza agregaty tylko od kuponu o indeksie `start` do końca.
     
-    for row in rows:
-        stake = parse_float(row["Stawka (S)"]) or 0.0
-        odds = parse_float(row["Kurs"]) or 0.0
-        result = row["Wynik"].strip().upper()
-        
-        # Zasilenie dla tego kuponu (może być 0.00 jeśli nie było zasilenia)
-        deposit = parse_float(row.get("Zasilenie", "0")) or 0.0
-        sum_deposits += deposit
-        row["Zasilenie"] = f"{deposit:.2f}"
-        row["Suma zasieleń"] = f"{sum_deposits:.2f}"
-        
-        # Aktualizuj sumę włożoną (stawek)
-        sum_stakes += stake
-        row["Suma włożona do tej pory"] = f"{sum_stakes:.2f}"
-        
-        # Wylicz wygraną brutto
-        gross_win = odds * stake
-        row["Wygrana brutto"] = f"{gross_win:.2f}"
-        
-        # Jeśli kupon rozstrzygnięty, uwzględnij w sumie wygranych
-        if result == "WYGRANA":
-            sum_wins_settled += gross_win
-        elif result == "PRZEGRANA":
-            pass  # Wygrana = 0, już uwzględnione
-        # OCZEKUJE - nie dodawaj do sum_wins_settled
-        
+    Sumy są narastające, więc zmiana kuponu k (edycja, rozliczenie, usunięcie)
+    albo dopisanie nowego na końcu wymaga przeliczenia tylko wierszy [k:].
+    Sumy sprzed `start` są odtwarzane z agregatów zapisanych w wierszu
+    rows[start - 1]; jeśli nie da się ich odczytać, liczone jest wszystko.
+    
+    Args:
+        rows: Lista kuponów (modyfikowana in-place). Wiersze przed `start`
+            muszą mieć aktualne agregaty (po recompute_aggregates albo
+            update_from) i nie mogą się od tamtej pory zmienić.
+        start: Indeks pierwszego zmienionego (lub usuniętego) kuponu.
+    """
+    # Wiersze się zmieniły (albo zaraz zmienią) - stare statusy są nieaktualne
+    bump_rows_version()
+    
+    # Sumy na końcu niezmienionej części
+    initial = _sums_before(rows, start) if 0 < start <= len(rows) else None
+    if initial is None:
+        start = 0
+        initial = (0, 0, 0)
+    
+    # Jedno przejście po zmienionych wierszach - wyciągnięcie kolumn liczbowych.
+    # Kwoty liczone w groszach (int) - sumy są dokładne, bez dryfu float.
+    changed_rows = rows[start:]
+    table = CouponTable.from_rows(changed_rows)
+    stakes = list(map(to_cents, table.stakes))
+    deposits = list(map(to_cents, table.deposits))
+    results = table.results
+    
+    # Wygrana brutto (dla OCZEKUJE - potencjalna), zaokrąglona do grosza
+    gross_wins = list(map(gross_cents, table.odds, stakes))
+    
+    # Sumy narastające (prefix sums), kontynuowane od niezmienionej części:
+    # - suma zasieleń (kapitał)
+    # - suma wszystkich stawek (włącznie z oczekującymi)
+    # - suma wygranych tylko z rozstrzygniętych kuponów (WYGRANA)
+    sums_deposits = list(accumulate(deposits, initial=initial[0]))[1:]
+    sums_stakes = list(accumulate(stakes, initial=initial[1]))[1:]
+    sums_wins = list(accumulate(
+        (gross if result == "WYGRANA" else 0
+         for result, gross in zip(results, gross_wins)),
+        initial=initial[2]
+    ))[1:]
+    
+    # Kolumny z powtarzającymi się wartościami (zasilenie zwykle 0.00, suma
+    # zasileń stała między wpłatami) formatowane hurtem - każda wartość raz
+    deposits_str = _format_repeated(deposits)
+    sums_deposits_str = _format_repeated(sums_deposits)
+    
+    k_deposit, k_sum_deposits, k_sum_stakes = COL_DEPOSIT, COL_SUM_DEPOSITS, COL_SUM_STAKES
+    k_gross_win, k_balance, k_net_profit = COL_GROSS_WIN, COL_BALANCE, COL_NET_PROFIT
+    fmt = format_cents
+    for row, result, deposit_str, gross_win, sum_deposits_str, sum_stakes, sum_wins_settled in zip(
+            changed_rows, results, deposits_str, gross_wins, sums_deposits_str, sums_stakes, sums_wins):
         # Wylicz saldo (suma wygranych - suma stawek)
         # Dla kuponu OCZEKUJE pokazujemy potencjalne saldo
         if result == "OCZEKUJE":
-            potential_balance = sum_wins_settled + gross_win - sum_stakes
-            row["Saldo"] = f"{potential_balance:.2f}"
-            # Zysk netto = saldo (bo wkład jest oddzielnie śledzony w zasileniach)
-            row["Zysk netto"] = f"{potential_balance:.2f}"
+            balance = sum_wins_settled + gross_win - sum_stakes
         else:
-            # Rzeczywiste saldo po rozstrzygnięciu
-            actual_balance = sum_wins_settled - sum_stakes
-            row["Saldo"] = f"{actual_balance:.2f}"
-            # Zysk netto = saldo (bo wkład jest oddzielnie śledzony w zasileniach)
-            row["Zysk netto"] = f"{actual_balance:.2f}"
+            balance = sum_wins_settled - sum_stakes
+        balance_str = fmt(balance)
+        
+        row[k_deposit] = deposit_str
+        row[k_sum_deposits] = sum_deposits_str
+        row[k_sum_stakes] = fmt(sum_stakes)
+        row[k_gross_win] = fmt(gross_win)
+        row[k_balance] = balance_str
+        # Zysk netto = saldo (bo wkład jest oddzielnie śledzony w zasileniach)
+        row[k_net_profit] = balance_str
 
 
-def get_current_status(rows: List[Dict[str, str]], profit_target: float = None) -> Dict[str, float]:
+def _sums_before(rows: List[Dict[str, str]], start: int) -> Optional[Tuple[int, int, int]]:
+    """
+    Odtwarza sumy narastające na końcu kuponu rows[start - 1] z jego agregatów.
+    
+    Args:
+        rows: Lista kuponów z aktualnymi agregatami do indeksu `start`.
+        start: Indeks pierwszego przeliczanego kuponu (> 0).
+    
+    Returns:
+        Krotka (suma zasieleń, suma stawek, suma wygranych rozstrzygniętych)
+        w groszach albo None, jeśli agregatów nie da się odczytać.
+    """
+    row = rows[start - 1]
+    values = [parse_float(row.get(key)) for key in (COL_SUM_DEPOSITS, COL_SUM_STAKES, COL_BALANCE, COL_GROSS_WIN)]
+    if None in values:
+        return None
+    sum_deposits, sum_stakes, balance, gross_win = map(to_cents, values)
+    # Saldo = suma wygranych - suma stawek; dla kuponu OCZEKUJE zawiera też
+    # jego potencjalną wygraną brutto (patrz update_from)
+    sum_wins = balance + sum_stakes
+    if normalize_result(row.get(COL_RESULT)) == "OCZEKUJE":
+        sum_wins -= gross_win
+    return (sum_deposits, sum_stakes, sum_wins)
+
+
+def _format_repeated(values: List[int]) -> List[str]:
+    """
+    Formatuje kolumnę kwot w groszach do tekstu z 2 miejscami po przecinku.
+    
+    Każda różna wartość jest formatowana tylko raz - opłacalne dla kolumn,
+    w których większość wartości się powtarza.
+    
+    Args:
+        values: Lista kwot w groszach.
+    
+    Returns:
+        Lista sformatowanych kwot (np. "12.50").
+    """
+    formatted = {}
+    result = []
+    get, append, fmt = formatted.get, result.append, format_cents
+    for value in values:
+        text = get(value)
+        if text is None:
+            text = formatted[value] = fmt(value)
+        append(text)
+    return result
+
+
+def get_current_status(rows: Union[List[Dict[str, str]], CouponTable],
+                       profit_target: float = None) -> Dict[str, float]:
     """
     Oblicza bieżący stan gry na podstawie rozstrzygniętych kuponów.
     
     Args:
-        rows: Lista wszystkich kuponów.
+        rows: Lista wszystkich kuponów (lub CouponTable).
         profit_target: Docelowy zysk (jeśli None, używa domyślnego).
         
     Returns:
         Słownik z kluczami: sum_deposits, sum_stakes, sum_wins, balance, budget, net_profit, target.
     """
-    sum_deposits = 0.0  # Suma zasieleń (całkowity wkład)
-    sum_stakes = 0.0    # Suma stawek
-    sum_wins = 0.0      # Suma wygranych
-    
-    for row in rows:
-        result = row["Wynik"].strip().upper()
-        
-        # Suma zasieleń zawsze (niezależnie od statusu)
-        deposit = parse_float(row.get("Zasilenie", "0")) or 0.0
-        sum_deposits += deposit
-        
-        # Uwzględnij WSZYSTKIE stawki (włącznie z oczekującymi) dla budżetu
-        stake = parse_float(row["Stawka (S)"]) or 0.0
-        sum_stakes += stake
-        
-        # Uwzględnij tylko rozstrzygnięte wygrane
-        if result == "WYGRANA":
-            odds = parse_float(row["Kurs"]) or 0.0
-            sum_wins += odds * stake
+    # Użyj przekazanego profit_target lub domyślnego
+    target_profit = profit_target if profit_target is not None else PROFIT_TARGET
+    table = as_table(rows)
+    
+    # Sumy liczone w groszach (jak agregaty w wierszach), wynik w złotych
+    stakes = list(map(to_cents, table.stakes))
+    # Suma zasieleń zawsze (niezależnie od statusu)
+    sum_deposits = sum(map(to_cents, table.deposits)) / 100
+    # Uwzględnij WSZYSTKIE stawki (włącznie z oczekującymi) dla budżetu
+    sum_stakes = sum(stakes) / 100
+    # Uwzględnij tylko rozstrzygnięte wygrane
+    sum_wins = sum(gross for result, gross in zip(table.results, map(gross_cents, table.odds, stakes))
+                   if result == "WYGRANA") / 100
     
     balance = sum_wins - sum_stakes  # Saldo (suma wygranych - suma stawek)
     budget = max(0, sum_deposits + balance)  # Budżet (dostępne środki = max(0, wkład + saldo))
     net_profit = balance  # Zysk netto = saldo (bo wkład jest osobno)
     
-    # Użyj przekazanego profit_target lub domyślnego
-    target_profit = profit_target if profit_target is not None else PROFIT_TARGET
     target = sum_deposits + target_profit  # Cel: wkład + docelowy zysk
     
     return {
@@ -244,12 +552,12 @@ def calculate_potential_result(budget: float, stake: float, odds: float,
     }
 
 
-def get_next_coupon_number(rows: List[Dict[str, str]]) -> int:
+def get_next_coupon_number(rows: Union[List[Dict[str, str]], CouponTable]) -> int:
     """
     Pobiera numer następnego kuponu.
     
     Args:
-        rows: Lista istniejących kuponów.
+        rows: Lista istniejących kuponów (lub CouponTable).
         
     Returns:
         Numer następnego kuponu.
@@ -257,14 +565,39 @@ def get_next_coupon_number(rows: List[Dict[str, str]]) -> int:
     if not rows:
         return 1
     
-    max_number = max(int(row["Kupon"]) for row in rows)
+    if isinstance(rows, CouponTable):
+        return max(map(int, rows.numbers)) + 1
+    
+    max_number = max(int(row[COL_NUMBER]) for row in rows)
     return max_number + 1
 
 
+def find_coupon_index(rows: List[Dict[str, str]], coupon_number: str) -> Optional[int]:
+    """
+    Zwraca indeks pierwszego kuponu o podanym numerze.
+    
+    Args:
+        rows: Lista kuponów.
+        coupon_number: Numer szukanego kuponu.
+    
+    Returns:
+        Indeks kuponu w liście lub None, jeśli nie znaleziono.
+    """
+    k_number = COL_NUMBER
+    for i, row in enumerate(rows):
+        if row.get(k_number) == coupon_number:
+            return i
+    return None
+
+
+@lru_cache(maxsize=2048)
 def format_currency(amount: float) -> str:
     """
     Formatuje kwotę jako walutę z prefiksem +/- dla dodatnich/ujemnych wartości.
     
+    Funkcja jest czysta, więc wyniki są zapamiętywane - te same kwoty (saldo,
+    budżet, cel) są formatowane przy każdym odświeżeniu interfejsu.
+    
     Args:
         amount: Kwota do sformatowania.
         
@@ -386,42 +719,38 @@ def create_withdrawal_coupon(amount: float, next_number: int, current_deposits:
     }
 
 
-def get_transaction_history(rows: List[Dict[str, str]]) -> List[Dict[str, any]]:
+def get_transaction_history(rows: Union[List[Dict[str, str]], CouponTable]) -> List[Dict[str, any]]:
     """
     Pobiera historię transakcji (wpłaty i wypłaty).
     
     Args:
-        rows: Lista wszystkich kuponów.
+        rows: Lista wszystkich kuponów (lub CouponTable).
         
     Returns:
         Lista transakcji z informacjami o wpłatach/wypłatach.
     """
+    table = as_table(rows)
     transactions = []
     
-    for row in rows:
-        deposit = parse_float(row.get("Zasilenie", "0")) or 0.0
-        stake = parse_float(row.get("Stawka (S)", "0")) or 0.0
-        result = row["Wynik"].strip().upper()
-        
+    for number, result, stake, odds, deposit in zip(
+            table.numbers, table.results, table.stakes, table.odds, table.deposits):
         # Sprawdź czy to wpłata (zasilenie > 0)
         if deposit > 0:
             transactions.append({
                 "type": "deposit",
                 "amount": deposit,
-                "coupon": row["Kupon"],
+                "coupon": number,
                 "description": f"Wpłata {deposit:.2f} zł"
             })
         
-        # Sprawdź czy to wypłata (stawka bez kursu/gry)
-        if stake > 0 and result == "PRZEGRANA" and parse_float(row.get("Kurs", "0")) == 1.0:
-            # To może być wypłata - sprawdź czy nie ma zasilenia
-            if deposit == 0:
-                transactions.append({
-                    "type": "withdrawal",
-                    "amount": stake,
-                    "coupon": row["Kupon"],
-                    "description": f"Wypłata {stake:.2f} zł"
-                })
+        # Sprawdź czy to wypłata (stawka bez kursu/gry, bez zasilenia)
+        elif stake > 0 and deposit == 0 and odds == 1.0 and result == "PRZEGRANA":
+            transactions.append({
+                "type": "withdrawal",
+                "amount": stake,
+                "coupon": number,
+                "description": f"Wypłata {stake:.2f} zł"
+            })
     
     return transactions
 
@@ -437,31 +766,88 @@ def delete_coupon(rows: list, coupon_number: str) -> bool:
     Returns:
         bool: True jeśli kupon został usunięty, False jeśli nie znaleziono
     """
-    for i, row in enumerate(rows):
-        if row.get("Kupon") == coupon_number:
-            del rows[i]
-            return True
-    return False
+    i = find_coupon_index(rows, coupon_number)
+    if i is None:
+        return False
+    del rows[i]
+    bump_rows_version()
+    return True
 
 
-def delete_coupons(rows: list, coupon_numbers: list) -> int:
+def delete_coupons(rows: list, coupon_numbers: Iterable[str]) -> int:
     """
     Usuwa wiele kuponów z listy.
     
     Args:
         rows: Lista kuponów
-        coupon_numbers: Lista numerów kuponów do usunięcia
+        coupon_numbers: Numery kuponów do usunięcia (lista lub zbiór)
     
     Returns:
         int: Liczba usuniętych kuponów
     """
-    deleted_count = 0
-    for coupon_number in coupon_numbers:
-        if delete_coupon(rows, coupon_number):
-            deleted_count += 1
+    return _delete_coupons(rows, coupon_numbers)[0]
+
+
+def delete_and_recompute(rows: list, coupon_numbers: Iterable[str]) -> int:
+    """
+    Usuwa wiele kuponów i przelicza agregaty pozostałych.
+    
+    Kupony przed pierwszym usuwanym nie są ani przeglądane, ani przeliczane -
+    usuwanie i przeliczenie (update_from) obejmują tylko dalszą część listy.
+    
+    Args:
+        rows: Lista kuponów (modyfikowana in-place)
+        coupon_numbers: Numery kuponów do usunięcia (lista lub zbiór)
+    
+    Returns:
+        int: Liczba usuniętych kuponów
+    """
+    deleted_count, start = _delete_coupons(rows, coupon_numbers)
+    if deleted_count:
+        update_from(rows, start)
     return deleted_count
 
 
+def _delete_coupons(rows: list, coupon_numbers: Iterable[str]) -> Tuple[int, int]:
+    """
+    Usuwa kupony o podanych numerach.
+    
+    Każdy numer usuwa pierwszy pasujący kupon (podany dwa razy - dwa
+    pierwsze), jak delete_coupon.
+    
+    Args:
+        rows: Lista kuponów
+        coupon_numbers: Numery kuponów do usunięcia (lista lub zbiór)
+    
+    Returns:
+        Krotka (liczba usuniętych kuponów, indeks pierwszego usuniętego).
+    """
+    # Licznik numerów (słownik) - sprawdzenie wiersza to O(1) niezależnie od
+    # liczby zaznaczonych kuponów; działa też dla zbioru numerów
+    to_delete = Counter(coupon_numbers)
+    
+    # Pierwszy usuwany kupon - od niego zaczyna się zmieniona część listy
+    k_number = COL_NUMBER
+    start = next((i for i, row in enumerate(rows) if row.get(k_number) in to_delete), None)
+    if start is None:
+        return 0, 0
+    
+    # Jedno przejście po pozostałej części zamiast osobnego wyszukiwania
+    # i przesuwania listy dla każdego numeru
+    kept = []
+    for row in rows[start:]:
+        number = row.get(COL_NUMBER)
+        if to_delete.get(number, 0) > 0:
+            to_delete[number] -= 1
+        else:
+            kept.append(row)
+    
+    deleted_count = len(rows) - start - len(kept)
+    rows[start:] = kept
+    bump_rows_version()
+    return deleted_count, start
+
+
 def edit_coupon(rows: list, coupon_number: str, new_name: str, new_stake: float, new_odds: float) -> bool:
     """
     Edytuje kupon w liście.
@@ -483,14 +869,36 @@ def edit_coupon(rows: list, coupon_number: str, new_name: str, new_stake: float,
                 row['Nazwa'] = new_name if new_name.strip() else f"Kupon #{coupon_number}"
                 row['Stawka (S)'] = f"{new_stake:.2f}"
                 row['Kurs'] = f"{new_odds:.2f}"
+                bump_rows_version()
                 return True
     return False
 
 
 def is_pending(row) -> bool:
     """Sprawdza czy kupon oczekuje na rozliczenie"""
-    val = str(row.get("Wynik", "")).strip().upper()
-    return val in {"OCZEKUJE", ""}
+    val = row.get("Wynik", "")
+    # Wartość kanoniczna (zwykły przypadek) - bez str()/strip()/upper()
+    if val in _PENDING_RESULTS:
+        return True
+    return str(val).strip().upper() in _PENDING_RESULTS
+
+
+def get_pending_coupons(rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Zwraca kupony oczekujące na rozliczenie.
+    
+    Korzysta ze znormalizowanej kolumny wyników tabeli kolumnowej (patrz
+    as_table), więc zamiast wywołania is_pending dla każdego wiersza jest
+    jedno sprawdzenie przynależności na gotowym stringu.
+    
+    Args:
+        rows: Lista kuponów.
+    
+    Returns:
+        Kupony OCZEKUJE (te same słowniki co w `rows`), w kolejności listy.
+    """
+    mask = map(_PENDING_RESULTS.__contains__, as_table(rows).results)
+    return list(compress(rows, mask))
 
 
 def validate_budget_for_stake(rows: list, stake: float) -> tuple[bool, str]:
@@ -535,11 +943,16 @@ def save_profit_target(target: float) -> bool:
     Returns:
         True jeśli zapisano pomyślnie, False w przeciwnym razie
     """
+    global _profit_target_cache
+    
     try:
-        with open('profit_target.txt', 'w') as f:
+        with open(PROFIT_TARGET_FILE, 'w') as f:
             f.write(str(target))
+        stat = os.stat(PROFIT_TARGET_FILE)
+        _profit_target_cache = ((stat.st_mtime_ns, stat.st_size), float(str(target)))
         return True
     except Exception as e:
+        _profit_target_cache = None
         print(f"Błąd podczas zapisywania celu: {e}")
         return False
 
@@ -548,16 +961,29 @@ def load_profit_target() -> float:
     """
     Wczytuje docelowy zysk z pliku.
     
+    Wartość jest zapamiętywana - przy niezmienionym pliku (data modyfikacji
+    i rozmiar) kolejne wywołania nie otwierają go ponownie.
+    
     Returns:
         Docelowy zysk lub domyślną wartość 100.0 jeśli plik nie istnieje
     """
+    global _profit_target_cache
+    
     try:
-        if os.path.exists('profit_target.txt'):
-            with open('profit_target.txt', 'r') as f:
-                content = f.read().strip()
-                return float(content)
-        else:
+        try:
+            stat = os.stat(PROFIT_TARGET_FILE)
+        except FileNotFoundError:
             return PROFIT_TARGET
+        
+        file_key = (stat.st_mtime_ns, stat.st_size)
+        if _profit_target_cache is not None and _profit_target_cache[0] == file_key:
+            return _profit_target_cache[1]
+        
+        with open(PROFIT_TARGET_FILE, 'r') as f:
+            content = f.read().strip()
+            target = float(content)
+        _profit_target_cache = (file_key, target)
+        return target
     except Exception as e:
         print(f"Błąd podczas wczytywania celu: {e}")
         return PROFIT_TARGET
@@ -8,9 +8,13 @@ Obsługuje tryb sesji (dane w pamięci) oraz tryb plikowy.
 """
 
 import csv
+import operator
 import os
 import io
-from typing import List, Dict, Optional
+import shutil
+import sys
+import threading
+from typing import List, Dict, Optional, Tuple
 
 
 # ============================================================================
@@ -18,7 +22,7 @@ from typing import List, Dict, Optional
 # ============================================================================
 
 CSV_FILE = "baza_kuponow.csv"
-CSV_HEADERS = [
+CSV_HEADERS = (
     "Kupon",
     "Nazwa",
     "Wynik",
@@ -30,13 +34,91 @@ CSV_HEADERS = [
     "Wygrana brutto",
     "Saldo",
     "Zysk netto"
-]
+)
+
+# Nagłówki jako zbiór - do sprawdzania brakujących/nieznanych kolumn
+_CSV_HEADERS_SET = frozenset(CSV_HEADERS)
+
+# Pola wiersza w kolejności nagłówków (krotka z itemgetter) - schemat jest
+# stały, więc getter wystarczy zbudować raz
+_get_header_fields = operator.itemgetter(*CSV_HEADERS)
+
+# Wartości kolumny Wynik zapisywane przez aplikację (już znormalizowane)
+CANONICAL_RESULTS = frozenset({"WYGRANA", "PRZEGRANA", "OCZEKUJE", ""})
+
+# Liczba wierszy ostatnio policzona w get_csv_info, z kluczem
+# (mtime_ns, rozmiar) pliku - ponowne liczenie tylko gdy plik się zmienił.
+_rows_count_cache: Optional[Tuple[Tuple[int, int], int]] = None
+
+
+# Bufor StringIO do budowania CSV w pamięci, osobny dla każdego wątku
+# (Streamlit obsługuje sesje w wielu wątkach) - patrz _get_buffer
+_buffers = threading.local()
+
+# Pusty szablon CSV (same nagłówki) - budowany przy pierwszym użyciu
+_template_csv: Optional[str] = None
 
 
 # ============================================================================
 # FUNKCJE OBSŁUGI CSV
 # ============================================================================
 
+def read_dict_rows(f) -> Tuple[Optional[List[str]], List[Dict[str, str]]]:
+    """
+    Wczytuje wiersze CSV jako słowniki, szybciej niż csv.DictReader.
+    
+    Wiersze są czytane przez csv.reader, a słowniki budowane przez
+    dict(zip(nagłówki, wiersz)) w jednym wyrażeniu. Semantyka jak w DictReader:
+    puste linie są pomijane, brakujące pola mają wartość None, a nadmiarowe
+    trafiają pod klucz None.
+    
+    Args:
+        f: Otwarty plik (lub StringIO) z danymi CSV.
+    
+    Returns:
+        Tuple (nagłówki lub None dla pustego pliku, lista wierszy).
+    """
+    reader = csv.reader(f)
+    fieldnames = next(reader, None)
+    if fieldnames is None:
+        return None, []
+    
+    n = len(fieldnames)
+    rows = []
+    for row in reader:
+        if not row:
+            continue  # Pusta linia
+        if len(row) == n:
+            rows.append(dict(zip(fieldnames, row)))
+        else:
+            # Niepełny lub nadmiarowy wiersz - uzupełnij jak DictReader
+            d = dict(zip(fieldnames, row))
+            if len(row) < n:
+                for key in fieldnames[len(row):]:
+                    d[key] = None
+            else:
+                d[None] = row[n:]
+            rows.append(d)
+    return fieldnames, rows
+
+
+def normalize_results(rows: List[Dict[str, str]]) -> None:
+    """
+    Normalizuje kolumnę Wynik wczytanych wierszy (strip + upper).
+    
+    Wykonywane raz przy wczytaniu, dzięki czemu dalsze obliczenia porównują
+    już kanoniczne (internowane) stringi.
+    
+    Args:
+        rows: Lista kuponów (modyfikowana in-place).
+    """
+    canonical = CANONICAL_RESULTS
+    for row in rows:
+        result = row.get("Wynik")
+        if isinstance(result, str) and result not in canonical:
+            row["Wynik"] = sys.intern(result.strip().upper())
+
+
 def load_rows() -> List[Dict[str, str]]:
     """
     Wczytuje wiersze z pliku CSV.
@@ -50,42 +132,124 @@ def load_rows() -> List[Dict[str, str]]:
     
     try:
         with open(CSV_FILE, 'r', encoding='utf-8', newline='') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
+            fieldnames, rows = read_dict_rows(f)
             
-            # Sprawdź czy to stary format (bez kolumny "Zasilenie")
-            if reader.fieldnames and "Zasilenie" not in reader.fieldnames:
-                print(f"⚠️  Wykryto stary format CSV. Migruję do nowego formatu...")
-                rows = migrate_old_format(rows)
-                print(f"✅ Migracja zakończona!")
-            # Walidacja nagłówków
-            elif reader.fieldnames != CSV_HEADERS:
-                print(f"⚠️  Uwaga: Nagłówki w pliku nie pasują do oczekiwanych.")
-                print(f"   Oczekiwane: {CSV_HEADERS}")
-                print(f"   Znalezione: {reader.fieldnames}")
-                
+            # Zwykły przypadek (aktualny format) - jedno porównanie krotek,
+            # bez sprawdzania migracji
+            canonical = fieldnames is not None and tuple(fieldnames) == CSV_HEADERS
+            if not canonical:
+                # Sprawdź czy to stary format (bez kolumny "Zasilenie")
+                if fieldnames and "Zasilenie" not in fieldnames:
+                    print(f"⚠️  Wykryto stary format CSV. Migruję do nowego formatu...")
+                    rows = migrate_old_format(rows)
+                    print(f"✅ Migracja zakończona!")
+                # Walidacja nagłówków
+                else:
+                    print(f"⚠️  Uwaga: Nagłówki w pliku nie pasują do oczekiwanych.")
+                    print(f"   Oczekiwane: {list(CSV_HEADERS)}")
+                    print(f"   Znalezione: {fieldnames}")
+            
+            normalize_results(rows)
             return rows
     except Exception as e:
         print(f"❌ Błąd podczas wczytywania pliku CSV: {e}")
         return []
 
 
+def write_rows(f, rows: List[Dict[str, str]]) -> None:
+    """
+    Zapisuje nagłówki i wiersze CSV do otwartego pliku (lub StringIO).
+    
+    Odpowiednik csv.DictWriter.writerows, ale wiersze są zamieniane na krotki
+    w kolejności CSV_HEADERS (operator.itemgetter) i zapisywane przez
+    csv.writer - bez odwołań do słownika w pętli zapisu.
+    Brakujące pola są zapisywane jako puste, a nieznane klucze powodują
+    ValueError - tak jak w DictWriter.
+    
+    Args:
+        f: Otwarty plik (lub StringIO) do zapisu.
+        rows: Lista słowników z danymi kuponów.
+    
+    Raises:
+        ValueError: Jeśli wiersz zawiera pola spoza CSV_HEADERS.
+    """
+    headers = CSV_HEADERS
+    header_set = _CSV_HEADERS_SET
+    # Pełny wiersz - krotka z itemgetter w C, bez 11 wywołań get() na wiersz.
+    # Walidacja kluczy w tym samym przejściu: KeyError przy pełnej długości
+    # oznacza nieznany klucz w miejscu brakującego nagłówka.
+    get_fields = _get_header_fields
+    n = len(headers)
+    out_rows = []
+    append = out_rows.append
+    for row in rows:
+        if len(row) == n:
+            try:
+                append(get_fields(row))
+                continue
+            except KeyError:
+                pass
+        if not header_set.issuperset(row):
+            wrong_fields = [key for key in row if key not in header_set]
+            raise ValueError("dict contains fields not in fieldnames: "
+                             + ", ".join([repr(x) for x in wrong_fields]))
+        append(tuple([row.get(h, "") for h in headers]))
+    
+    writer = csv.writer(f)
+    writer.writerow(headers)
+    writer.writerows(out_rows)
+
+
+def _get_buffer() -> io.StringIO:
+    """
+    Zwraca wyczyszczony bufor StringIO bieżącego wątku.
+    
+    Bufor jest używany ponownie przy każdym zapisie CSV zamiast tworzenia
+    nowego obiektu. Wynik trzeba odczytać przez getvalue() przed kolejnym
+    wywołaniem w tym samym wątku.
+    
+    Returns:
+        Pusty bufor StringIO.
+    """
+    buffer = getattr(_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = _buffers.buffer = io.StringIO()
+    else:
+        buffer.seek(0)
+        buffer.truncate(0)
+    return buffer
+
+
 def save_rows(rows: List[Dict[str, str]]) -> None:
     """
     Zapisuje wiersze do pliku CSV.
     
+    CSV jest budowany w pamięci i zapisywany jednym wywołaniem do pliku
+    tymczasowego, który następnie zastępuje CSV_FILE (os.replace) - przerwany
+    zapis nie zostawia uszkodzonej bazy. Nowy plik dostaje uprawnienia
+    dotychczasowego, a po błędzie plik tymczasowy jest usuwany.
+    
     Args:
         rows: Lista słowników z danymi kuponów.
     """
+    tmp_file = CSV_FILE + ".tmp"
     try:
-        with open(CSV_FILE, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
-            writer.writeheader()
-            writer.writerows(rows)
+        output = _get_buffer()
+        write_rows(output, rows)
+        with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(output.getvalue())
+        if os.path.exists(CSV_FILE):
+            shutil.copymode(CSV_FILE, tmp_file)
+        os.replace(tmp_file, CSV_FILE)
         print(f"✅ Dane zapisane do {CSV_FILE}")
     except Exception as e:
         print(f"❌ Błąd podczas zapisywania pliku CSV: {e}")
         print(f"   Upewnij się, że masz uprawnienia do zapisu w tym katalogu.")
+        # Nie zostawiaj niedokończonego pliku tymczasowego obok bazy
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
 
 
 def migrate_old_format(old_rows: List[Dict[str, str]], initial_deposit: float = None) -> List[Dict[str, str]]:
@@ -155,7 +319,6 @@ def backup_csv(backup_suffix: str = None) -> str:
         backup_name = f"{CSV_FILE}.backup_{timestamp}"
     
     try:
-        import shutil
         shutil.copy2(CSV_FILE, backup_name)
         print(f"✅ Utworzono backup: {backup_name}")
         return backup_name
@@ -191,9 +354,14 @@ def get_csv_info() -> Dict[str, any]:
     """
     Pobiera informacje o pliku CSV.
     
+    Liczba wierszy jest zapamiętywana dla danej daty modyfikacji i rozmiaru
+    pliku, więc plik jest parsowany ponownie tylko po zmianie.
+    
     Returns:
         Słownik z informacjami o pliku.
     """
+    global _rows_count_cache
+    
     info = {
         "exists": os.path.exists(CSV_FILE),
         "size": 0,
@@ -203,17 +371,22 @@ def get_csv_info() -> Dict[str, any]:
     
     if info["exists"]:
         try:
-            info["size"] = os.path.getsize(CSV_FILE)
+            stat = os.stat(CSV_FILE)
+            info["size"] = stat.st_size
             
-            # Policz wiersze
-            with open(CSV_FILE, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                info["rows_count"] = sum(1 for row in reader) - 1  # -1 dla nagłówka
+            # Policz wiersze (lub weź z pamięci, jeśli plik się nie zmienił)
+            file_key = (stat.st_mtime_ns, stat.st_size)
+            if _rows_count_cache is not None and _rows_count_cache[0] == file_key:
+                info["rows_count"] = _rows_count_cache[1]
+            else:
+                with open(CSV_FILE, 'r', encoding='utf-8') as f:
+                    reader = csv.reader(f)
+                    info["rows_count"] = sum(1 for row in reader) - 1  # -1 dla nagłówka
+                _rows_count_cache = (file_key, info["rows_count"])
             
             # Data modyfikacji
             import datetime
-            timestamp = os.path.getmtime(CSV_FILE)
-            info["last_modified"] = datetime.datetime.fromtimestamp(timestamp)
+            info["last_modified"] = datetime.datetime.fromtimestamp(stat.st_mtime)
             
         except Exception as e:
             print(f"❌ Błąd podczas pobierania informacji o pliku: {e}")
@@ -232,10 +405,14 @@ def create_empty_template_csv() -> str:
     Returns:
         String zawierający pusty CSV z nagłówkami.
     """
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=CSV_HEADERS)
-    writer.writeheader()
-    return output.getvalue()
+    global _template_csv
+    
+    # Nagłówki są stałe, więc szablon wystarczy zbudować raz
+    if _template_csv is None:
+        output = _get_buffer()
+        write_rows(output, [])
+        _template_csv = output.getvalue()
+    return _template_csv
 
 
 def load_csv_from_string(csv_content: str) -> List[Dict[str, str]]:
@@ -249,20 +426,23 @@ def load_csv_from_string(csv_content: str) -> List[Dict[str, str]]:
         Lista słowników reprezentujących kupony.
     """
     try:
-        reader = csv.DictReader(io.StringIO(csv_content))
-        rows = list(reader)
+        fieldnames, rows = read_dict_rows(io.StringIO(csv_content))
         
-        # Sprawdź czy to stary format (bez kolumny "Zasilenie")
-        if reader.fieldnames and "Zasilenie" not in reader.fieldnames:
-            print(f"⚠️  Wykryto stary format CSV. Migruję do nowego formatu...")
-            rows = migrate_old_format(rows)
-            print(f"✅ Migracja zakończona!")
-        # Walidacja nagłówków
-        elif reader.fieldnames != CSV_HEADERS:
-            print(f"⚠️  Uwaga: Nagłówki w pliku nie pasują do oczekiwanych.")
-            print(f"   Oczekiwane: {CSV_HEADERS}")
-            print(f"   Znalezione: {reader.fieldnames}")
-            
+        # Zwykły przypadek (aktualny format) - jedno porównanie krotek,
+        # bez sprawdzania migracji
+        if fieldnames is None or tuple(fieldnames) != CSV_HEADERS:
+            # Sprawdź czy to stary format (bez kolumny "Zasilenie")
+            if fieldnames and "Zasilenie" not in fieldnames:
+                print(f"⚠️  Wykryto stary format CSV. Migruję do nowego formatu...")
+                rows = migrate_old_format(rows)
+                print(f"✅ Migracja zakończona!")
+            # Walidacja nagłówków
+            else:
+                print(f"⚠️  Uwaga: Nagłówki w pliku nie pasują do oczekiwanych.")
+                print(f"   Oczekiwane: {list(CSV_HEADERS)}")
+                print(f"   Znalezione: {fieldnames}")
+        
+        normalize_results(rows)
         return rows
     except Exception as e:
         print(f"❌ Błąd podczas wczytywania CSV z stringa: {e}")
@@ -280,10 +460,8 @@ def save_csv_to_string(rows: List[Dict[str, str]]) -> str:
         String zawierający dane CSV.
     """
     try:
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=CSV_HEADERS)
-        writer.writeheader()
-        writer.writerows(rows)
+        output = _get_buffer()
+        write_rows(output, rows)
         return output.getvalue()
     except Exception as e:
         print(f"❌ Błąd podczas zapisywania CSV do stringa: {e}")
@@ -301,19 +479,25 @@ def validate_csv_content(csv_content: str) -> tuple[bool, str]:
         Tuple (is_valid, error_message).
     """
     try:
-        reader = csv.DictReader(io.StringIO(csv_content))
-        fieldnames = reader.fieldnames
+        # Potrzebny jest tylko wiersz nagłówków - bez DictReader i bez
+        # czytania dalszych wierszy
+        fieldnames = next(csv.reader(io.StringIO(csv_content)), None)
         
         if not fieldnames:
             return False, "Plik CSV nie zawiera nagłówków"
         
+        # Zwykły przypadek - dokładnie oczekiwane kolumny
+        fieldnames_set = set(fieldnames)
+        if fieldnames_set == _CSV_HEADERS_SET:
+            return True, "Plik CSV jest prawidłowy"
+        
         # Sprawdź czy wszystkie wymagane kolumny są obecne
-        missing_headers = [header for header in CSV_HEADERS if header not in fieldnames]
+        missing_headers = [header for header in CSV_HEADERS if header not in fieldnames_set]
         if missing_headers:
             return False, f"Brakujące nagłówki: {', '.join(missing_headers)}"
         
         # Sprawdź czy nie ma nieznanych nagłówków
-        extra_headers = [header for header in fieldnames if header not in CSV_HEADERS]
+        extra_headers = [header for header in fieldnames if header not in _CSV_HEADERS_SET]
         if extra_headers:
             return False, f"Nieznane nagłówki: {', '.join(extra_headers)}"
         
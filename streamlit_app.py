@@ -8,11 +8,16 @@ według strategii Martingale z celem odzyskania wkładu + 100 zł zysku.
 """
 
 import streamlit as st
-import pandas as pd
-import numpy as np
 from datetime import datetime
 import os
 import math
+import operator
+from typing import TYPE_CHECKING
+
+# pandas jest importowany dopiero w funkcjach, które budują DataFrame - import
+# trwa ok. 0.5 s, a formularz pierwszego kuponu w ogóle go nie potrzebuje
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Import naszych modułów
 from business_logic import (
@@ -21,13 +26,15 @@ from business_logic import (
     get_game_status, validate_odds, validate_stake, parse_float,
     validate_withdrawal, create_deposit_coupon, create_withdrawal_coupon,
     get_transaction_history, PROFIT_TARGET, delete_coupon, delete_coupons,
-    edit_coupon, save_profit_target, load_profit_target, validate_budget_for_stake
+    edit_coupon, save_profit_target, load_profit_target, validate_budget_for_stake,
+    update_from, get_pending_coupons, get_rows_version, find_coupon_index,
+    delete_and_recompute
 )
 from csv_handler import (
     load_rows, save_rows, migrate_old_format, create_empty_csv,
     backup_csv, validate_csv_structure, get_csv_info, CSV_FILE,
     create_empty_template_csv, load_csv_from_string, save_csv_to_string,
-    validate_csv_content
+    validate_csv_content, CSV_HEADERS
 )
 
 # ============================================================================
@@ -49,6 +56,17 @@ def clear_session_data():
     if 'coupons_data' in st.session_state:
         del st.session_state.coupons_data
 
+def set_flash(kind: str, message: str):
+    """Zapamiętuje komunikat do pokazania po przebiegu wywołanym przez callback."""
+    st.session_state.flash = (kind, message)
+
+def show_flash():
+    """Pokazuje (jednorazowo) komunikat zapisany przez callback."""
+    flash = st.session_state.pop('flash', None)
+    if flash:
+        kind, message = flash
+        getattr(st, kind)(message)
+
 def load_csv_from_upload(uploaded_file):
     """Wczytuje dane CSV z przesłanego pliku."""
     try:
@@ -68,25 +86,78 @@ def load_csv_from_upload(uploaded_file):
         st.error(f"❌ Błąd podczas wczytywania pliku: {e}")
         return []
 
+def get_session_status(rows):
+    """
+    Zwraca stan gry (get_current_status) dla danych sesji.
+    
+    Zapamiętywany w session_state do następnej zmiany danych lub celu -
+    odświeżenia bez zmian w kuponach nie liczą statusu od nowa.
+    """
+    profit_target = st.session_state.profit_target
+    key = (id(rows), len(rows), get_rows_version(), profit_target)
+    cached = st.session_state.get('status_cache')
+    if cached is None or cached[0] != key:
+        cached = (key, get_current_status(rows, profit_target))
+        st.session_state.status_cache = cached
+    # Kopia - wywołujący może modyfikować zwrócony słownik
+    return dict(cached[1])
+
 def get_csv_download_data(rows):
-    """Przygotowuje dane CSV do pobrania."""
-    return save_csv_to_string(rows)
-
-# Funkcje pomocnicze
-def is_pending(row) -> bool:
-    """Sprawdza czy kupon oczekuje na rozliczenie"""
-    val = str(row.get("Wynik", "")).strip().upper()
-    return val in {"OCZEKUJE", ""}  # obsługuje stare rekordy z pustym Wynik
-
-def color_result(val):
-    """Koloruje wyniki kuponów w tabeli"""
-    v = str(val).strip().upper()
-    if v in ("WYGRANA", "W"):
-        return 'background-color: #d4edda; color: #155724;'
-    elif v in ("PRZEGRANA", "P"):
-        return 'background-color: #f8d7da; color: #721c24;'
-    else:
-        return 'background-color: #fff3cd; color: #856404;'
+    """
+    Przygotowuje dane CSV do pobrania.
+    
+    Przycisk pobierania jest rysowany przy każdym odświeżeniu skryptu, więc
+    CSV jest zapamiętywany w session_state do następnej zmiany danych.
+    """
+    key = (id(rows), len(rows), get_rows_version())
+    cached = st.session_state.get('csv_download_cache')
+    if cached is None or cached[0] != key:
+        cached = (key, save_csv_to_string(rows))
+        st.session_state.csv_download_cache = cached
+    return cached[1]
+
+def coupon_labels(rows):
+    """
+    Mapa numer kuponu -> etykieta (nazwa lub "Kupon #N") dla format_func.
+    
+    Budowana raz na odświeżenie zamiast przeszukiwania listy dla każdej opcji.
+    Przy powtórzonym numerze wygrywa pierwszy kupon.
+    """
+    labels = {}
+    for row in rows:
+        number = row['Kupon']
+        if number not in labels:
+            labels[number] = row.get('Nazwa') or f"Kupon #{number}"
+    return labels
+
+def get_coupon_labels(rows):
+    """
+    Etykiety wszystkich kuponów (coupon_labels) zapamiętane w session_state.
+    
+    Lista do usuwania obejmuje całą historię i jest rysowana przy każdym
+    odświeżeniu, więc mapa jest budowana ponownie dopiero po zmianie danych.
+    """
+    key = (id(rows), len(rows), get_rows_version())
+    cached = st.session_state.get('coupon_labels_cache')
+    if cached is None or cached[0] != key:
+        cached = (key, coupon_labels(rows))
+        st.session_state.coupon_labels_cache = cached
+    return cached[1]
+
+# Etykiety kolumny Wynik w tabeli historii - ikona zamiast stylu komórki
+RESULT_LABELS = {"WYGRANA": "🟢 WYGRANA", "W": "🟢 W", "PRZEGRANA": "🔴 PRZEGRANA", "P": "🔴 P",
+                 "OCZEKUJE": "🟡 OCZEKUJE", "": "🟡"}
+
+# Kolumny liczbowe tabeli historii (w wierszach przechowywane jako tekst)
+NUMERIC_COLUMNS = ["Stawka (S)", "Kurs", "Zasilenie", "Suma zasieleń", "Suma włożona do tej pory",
+                   "Wygrana brutto", "Saldo", "Zysk netto"]
+
+# Dostępne rozmiary strony tabeli historii kuponów
+PAGE_SIZES = [50, 100, 200]
+
+# Do tej liczby kuponów historia jest zwykłą tabelą (st.table) - wszystkie
+# wiersze mieszczą się na ekranie, a siatka st.dataframe nie jest potrzebna
+STATIC_TABLE_ROWS = 20
 
 
 # ============================================================================
@@ -106,19 +177,24 @@ st.set_page_config(
 
 def display_status_cards(status: dict):
     """Wyświetla karty ze statusem gry."""
+    # Wszystkie kwoty formatowane raz, niżej już tylko układ kart
+    text = {key: format_currency(status[key])
+            for key in ('sum_deposits', 'balance', 'budget', 'target', 'net_profit')}
+    text['to_target'] = format_currency(status['target'] - status['budget'])
+    text['profit_target'] = format_currency(st.session_state.profit_target)
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
             "💰 Wkład",
-            f"{format_currency(status['sum_deposits'])}",
-            delta=f"Saldo: {format_currency(status['balance'])}"
+            text['sum_deposits'],
+            delta=f"Saldo: {text['balance']}"
         )
     
     with col2:
         # Koloruj budżet w zależności od wartości
-        budget_value = status['budget']
-        if budget_value <= 0:
+        if status['budget'] <= 0:
             st.metric(
                 "🎯 Budżet",
                 f"0.00 zł",
@@ -127,47 +203,144 @@ def display_status_cards(status: dict):
         else:
             st.metric(
                 "🎯 Budżet",
-                f"{format_currency(budget_value)}",
-                delta=f"Cel: {format_currency(status['target'])}"
+                text['budget'],
+                delta=f"Cel: {text['target']}"
             )
     
     with col3:
-        delta = status['target'] - status['budget']
         st.metric(
             "🎯 Cel",
-            f"{format_currency(status['target'])}",
-            delta=f"Do celu: {format_currency(delta)}"
+            text['target'],
+            delta=f"Do celu: {text['to_target']}"
         )
     
     with col4:
         st.metric(
             "📊 Zysk netto",
-            f"{format_currency(status['net_profit'])}",
-            delta=f"Cel: {format_currency(st.session_state.profit_target)}"
+            text['net_profit'],
+            delta=f"Cel: {text['profit_target']}"
         )
 
 
+@st.fragment
 def display_coupons_table(rows: list):
     """
-    Wyświetla tabelę kuponów.
+    Wyświetla tabelę kuponów, podzieloną na strony.
+    
+    Do przeglądarki wysyłana jest tylko bieżąca strona, a zmiana strony
+    odświeża tylko ten fragment. Krótka historia jest pokazywana jako
+    statyczna tabela.
     """
     if not rows:
         st.info("📋 Brak kuponów w bazie danych.")
         return
     
-    # Konwertuj na DataFrame dla lepszego wyświetlania
-    df = pd.DataFrame(rows)
+    df = get_coupons_table_data(rows)
+    
+    # Krótka historia - statyczna tabela HTML zamiast interaktywnej siatki
+    if len(df) <= STATIC_TABLE_ROWS:
+        st.table(df.set_index("Kupon"))
+        return
+    
+    if len(df) > PAGE_SIZES[0]:
+        col1, col2 = st.columns(2)
+        with col1:
+            page_size = st.selectbox("Wierszy na stronę", PAGE_SIZES, index=1, key="coupons_page_size")
+        n_pages = (len(df) + page_size - 1) // page_size
+        # Po usunięciu kuponów (albo zmianie rozmiaru strony) zapamiętana
+        # strona może już nie istnieć
+        if st.session_state.get("coupons_page", 1) > n_pages:
+            st.session_state.coupons_page = n_pages
+        with col2:
+            page = st.number_input("Strona", min_value=1, max_value=n_pages, step=1,
+                                   key="coupons_page")
+        start = (page - 1) * page_size
+        df = df.iloc[start:start + page_size]
+        st.caption(f"Kupony {start + 1}-{start + len(df)} z {len(rows)}")
     
-    # Dodaj kolumny z kolorami dla lepszej czytelności
-    styled_df = df.style.map(color_result, subset=['Wynik'])
+    column_config = {
+        column: st.column_config.NumberColumn(format="%.2f") for column in NUMERIC_COLUMNS
+    }
+    # Kurs bez zaokrąglania do 0.01 - w danych może mieć więcej miejsc (np. 3.958)
+    column_config["Kurs"] = st.column_config.NumberColumn(format="%g")
+    column_config["Wynik"] = st.column_config.TextColumn(help="🟢 WYGRANA / 🔴 PRZEGRANA / 🟡 OCZEKUJE")
     
     st.dataframe(
-        styled_df,
+        numeric_columns(df),
         use_container_width=True,
-        height=400
+        height=400,
+        column_config=column_config
     )
 
 
+def numeric_columns(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Zamienia tekstowe kolumny liczbowe wyświetlanej strony na liczby.
+    
+    Kwoty i kurs jako float64 (dokładnie jak zapisane), numer kuponu jako
+    int32 - mniej danych w Arrow wysyłanym do przeglądarki niż tekst,
+    a sortowanie w siatce jest liczbowe. Zamieniana jest tylko
+    przekazana strona tabeli, nie cała historia.
+    """
+    import pandas as pd
+    
+    df = df.copy()
+    for column in NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    numbers = pd.to_numeric(df["Kupon"], errors="coerce")
+    # Numer kuponu zostaje tekstem, jeśli nie wszystkie są liczbami
+    if numbers.notna().all():
+        df["Kupon"] = numbers.astype("int32")
+    return df
+
+
+def get_coupons_table_data(rows: list):
+    """
+    Zwraca DataFrame tabeli kuponów.
+    
+    Jak CSV do pobrania - zapamiętywane w session_state do następnej zmiany
+    danych, więc odświeżenia po kliknięciach nie budują tabeli od nowa.
+    Wynik jest oznaczany ikoną (RESULT_LABELS) zamiast stylu komórki -
+    Streamlit nie musi serializować CSS dla każdej komórki (pandas Styler).
+    """
+    key = (id(rows), len(rows), get_rows_version())
+    cached = st.session_state.get('coupons_table_cache')
+    if cached is None or cached[0] != key:
+        df = coupons_dataframe(rows)
+        results = df['Wynik']
+        df['Wynik'] = results.map(RESULT_LABELS).fillna(results)
+        cached = (key, df)
+        st.session_state.coupons_table_cache = cached
+    return cached[1]
+
+
+def coupons_dataframe(rows: list) -> "pd.DataFrame":
+    """
+    Buduje DataFrame kuponów z krotek w kolejności kolumn CSV.
+    
+    Krotki (itemgetter) są dla pandas tańsze niż lista słowników, z której
+    kolumny trzeba dopiero zebrać po kluczach.
+    """
+    import pandas as pd
+    
+    try:
+        records = list(map(operator.itemgetter(*CSV_HEADERS), rows))
+    except KeyError:
+        # Wiersze spoza schematu CSV - pandas sam zbierze kolumny
+        return pd.DataFrame(rows)
+    # Wszystkie pola są tekstami (kwoty już sformatowane) - jawny typ
+    # object pomija wykrywanie typów kolumn przez pandas
+    return pd.DataFrame(records, columns=CSV_HEADERS, dtype=object)
+
+
+def section_header(title: str):
+    """
+    Wyświetla separator i nagłówek sekcji jako jeden element Markdown
+    (zamiast osobnych st.markdown("---") i st.subheader).
+    """
+    st.markdown(f"---\n### {title}")
+
+
 def display_game_status(status: dict):
     """
     Wyświetla status gry.
@@ -182,213 +355,156 @@ def display_game_status(status: dict):
         st.info(f"ℹ️ {game_status}")
 
 
+# ============================================================================
+# CALLBACKI USUWANIA
+# ============================================================================
+
+# Callbacki przycisków wykonują się przed przebiegiem skryptu wywołanym przez
+# kliknięcie - po usunięciu nie trzeba już drugiego przebiegu przez st.rerun().
+
+def delete_last_coupon_cb(rows: list):
+    """Usuwa ostatni kupon i przelicza kupony od jego pozycji."""
+    number = rows[-1]['Kupon']
+    # delete_coupon usuwa pierwszy kupon o tym numerze
+    coupon_idx = find_coupon_index(rows, number)
+    if delete_coupon(rows, number):
+        update_from(rows, coupon_idx)
+        save_session_data(rows)
+        set_flash("success", f"✅ Usunięto kupon #{number}")
+    else:
+        set_flash("error", f"❌ Nie udało się usunąć kuponu #{number}")
+
+def delete_selected_coupons_cb(rows: list):
+    """Usuwa kupony zaznaczone w formularzu usuwania."""
+    selected_coupons = st.session_state.get('delete_multiple_sidebar', [])
+    if not selected_coupons:
+        set_flash("warning", "⚠️ Wybierz kupony do usunięcia")
+        return
+    # Usunięcie i przeliczenie tylko od pierwszego usuwanego kuponu
+    deleted_count = delete_and_recompute(rows, selected_coupons)
+    if deleted_count > 0:
+        save_session_data(rows)
+        st.session_state.delete_multiple_sidebar = []
+        set_flash("success", f"✅ Usunięto {deleted_count} kuponów")
+    else:
+        set_flash("error", "❌ Nie udało się usunąć żadnego kuponu")
+
+
 # ============================================================================
 # GŁÓWNA FUNKCJA
 # ============================================================================
 
-def main():
-    """Główna funkcja aplikacji."""
-    
-    # Inicjalizuj profit_target w session_state z pliku
-    if 'profit_target' not in st.session_state:
-        st.session_state.profit_target = load_profit_target()
-    
-    # Nagłówek aplikacji
-    st.title("🎰 Aplikacja do Stawkowania Kuponów")
-    st.caption(f"🎯 Docelowy zysk: {st.session_state.profit_target} zł")
-    
-    # Pobierz dane z session_state
-    rows = get_session_data()
-    
-    # Interfejs do pobierania i wczytywania plików CSV
-    if not rows:
-        st.header("📁 Zarządzanie danymi")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("📥 Wczytaj dane")
-            uploaded_file = st.file_uploader(
-                "Wybierz plik CSV z danymi kuponów",
-                type=['csv'],
-                help="Wczytaj swój plik CSV z danymi kuponów"
-            )
-            
-            if uploaded_file is not None:
-                if st.button("📂 Wczytaj plik", type="primary"):
-                    rows = load_csv_from_upload(uploaded_file)
-                    if rows:
-                        # Przelicz agregaty po wczytaniu danych
-                        recompute_aggregates(rows)
-                        save_session_data(rows)
-                        st.success(f"✅ Wczytano {len(rows)} kuponów z pliku")
-                        st.rerun()
-        
-        with col2:
-            st.subheader("📤 Pobierz szablon")
-            st.info("Jeśli nie masz jeszcze pliku z danymi, pobierz pusty szablon CSV")
-            
-            # Przygotuj pusty szablon do pobrania
-            empty_csv = create_empty_template_csv()
-            
-            st.download_button(
-                label="📥 Pobierz pusty szablon CSV",
-                data=empty_csv,
-                file_name="szablon_kuponow.csv",
-                mime="text/csv",
-                help="Pobierz pusty szablon CSV, wypełnij go danymi i wczytaj z powrotem"
-            )
-        
-        st.markdown("---")
+def get_pending_table_data(rows: list):
+    """
+    Zwraca (kupony oczekujące, DataFrame do edytora, klucz edytora).
     
-    # Jeśli brak danych, pokaż formularz pierwszego kuponu
-    if not rows:
-        st.header("🎲 Utwórz pierwszy kupon")
-        st.info("Witaj! Aby rozpocząć, utwórz pierwszy kupon.")
-        
-        with st.form("first_coupon_form"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                deposit = st.number_input(
-                    "Początkowy wkład",
-                    min_value=0.01,
-                    step=0.01,
-                    value=100.0,
-                    format="%.2f"
-                )
-            
-            with col2:
-                st.subheader("🎲 Szczegóły pierwszego kuponu")
-            
-            # Pole nazwy
-            coupon_name = st.text_input(
-                "Nazwa kuponu",
-                placeholder="np. Mecz Real vs Barcelona",
-                help="Wpisz opisową nazwę dla tego kuponu"
-            )
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                odds = st.number_input(
-                    "Kurs",
-                    min_value=1.01,
-                    step=0.01,
-                    value=2.5,
-                    format="%.2f"
-                )
-            
-            with col2:
-                stake = st.number_input(
-                    "Stawka",
-                    min_value=0.01,
-                    step=0.01,
-                    value=10.0,
-                    format="%.2f"
-                )
-            
-            submitted = st.form_submit_button("✅ Utwórz pierwszy kupon", type="primary")
+    Zapamiętywane w session_state do następnej zmiany danych - każda edycja
+    komórki odświeża fragment, a tabela wejściowa pozostaje ta sama.
+    """
+    key = (id(rows), len(rows), get_rows_version())
+    cached = st.session_state.get('pending_table_cache')
+    if cached is None or cached[0] != key:
+        pending_coupons = get_pending_coupons(rows)
+        pending_df = None
+        editor_key = None
+        if pending_coupons:
+            import pandas as pd
             
-            if submitted:
-                if not validate_odds(odds):
-                    st.error("❌ Kurs musi być większy niż 1.0!")
-                elif not validate_stake(stake):
-                    st.error("❌ Stawka musi być większa niż 0!")
-                else:
-                    # Utwórz pierwszy kupon
-                    first_coupon = {
-                        "Kupon": "1",
-                        "Nazwa": coupon_name if coupon_name.strip() else "Kupon #1",
-                        "Wynik": "OCZEKUJE",
-                        "Stawka (S)": f"{stake:.2f}",
-                        "Kurs": f"{odds:.2f}",
-                        "Zasilenie": f"{deposit:.2f}",
-                        "Suma zasieleń": "0.00",
-                        "Suma włożona do tej pory": "0.00",
-                        "Wygrana brutto": "0.00",
-                        "Saldo": "0.00",
-                        "Zysk netto": "0.00"
-                    }
-                    
-                    rows = [first_coupon]
-                    recompute_aggregates(rows)
-                    save_session_data(rows)
-                    st.success("✅ Pierwszy kupon utworzony!")
-                    st.rerun()
-        
-        return
-    
-    # Oblicz aktualny status
-    status = get_current_status(rows, st.session_state.profit_target)
-    
-    if not status:
-        st.error("❌ Błąd podczas obliczania statusu gry.")
-        return
-    
-    # Wyświetl status gry
-    st.header("📊 Bieżący stan gry")
-    display_status_cards(status)
-    display_game_status(status)
-    
-    # Dodatkowe ostrzeżenie gdy budżet jest 0
-    if status['budget'] <= 0:
-        st.error("🚨 **UWAGA!** Wykorzystałeś cały dostępny budżet! Nie możesz grać dalej bez zasilenia konta.")
-        st.info("💡 **Co robić:** Zasil konto w sekcji 'Zarządzanie środkami' w sidebar, aby kontynuować grę.")
+            numbers = [coupon['Kupon'] for coupon in pending_coupons]
+            # Dla kuponu OCZEKUJE agregaty zawierają potencjalną wygraną brutto
+            pending_df = pd.DataFrame({
+                "Kupon": numbers,
+                "Nazwa": [coupon.get('Nazwa', f"Kupon #{coupon['Kupon']}") for coupon in pending_coupons],
+                "Kurs": [coupon['Kurs'] for coupon in pending_coupons],
+                "Stawka (S)": [coupon['Stawka (S)'] for coupon in pending_coupons],
+                "Potencjalna wygrana brutto": [coupon['Wygrana brutto'] for coupon in pending_coupons],
+                "Wynik": ["OCZEKUJE"] * len(pending_coupons),
+                "Usuń": [False] * len(pending_coupons)
+            })
+            # Klucz zależy od listy oczekujących - po jej zmianie edycje się zerują
+            editor_key = f"pending_editor_{hash(tuple(numbers))}"
+        cached = (key, (pending_coupons, pending_df, editor_key))
+        st.session_state.pending_table_cache = cached
+    return cached[1]
+
+
+@st.fragment
+def display_pending_coupons(rows: list):
+    """
+    Wyświetla kupony oczekujące z edytowalną tabelą rozliczeń.
     
-    # A) KUPONY OCZEKUJĄCE - lista wszystkich oczekujących z przyciskami rozliczania
-    pending_coupons = [row for row in rows if is_pending(row)]
+    Fragment - zmiany w tabeli odświeżają tylko tę sekcję, a nie całą
+    stronę. Po zapisie rozliczeń odświeżana jest cała aplikacja (status).
+    """
+    pending_coupons, pending_df, editor_key = get_pending_table_data(rows)
     
     if pending_coupons:
         st.header("⏳ Kupony oczekujące na rozliczenie")
         
-        for coupon in pending_coupons:
-            coupon_name = coupon.get('Nazwa', f"Kupon #{coupon['Kupon']}")
-            with st.expander(
-                f"{coupon_name} – kurs {coupon['Kurs']} – stawka {coupon['Stawka (S)']} zł",
-                expanded=False
-            ):
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.write(f"**Kurs:** {coupon['Kurs']}")
-                    st.write(f"**Stawka:** {coupon['Stawka (S)']} zł")
-                
-                with col2:
-                    potential_win = float(coupon['Kurs']) * float(coupon['Stawka (S)'])
-                    st.write(f"**Potencjalna wygrana brutto:** {potential_win:.2f} zł")
-                
-                with col3:
-                    if st.button("✅ Wygrana", key=f"win_{coupon['Kupon']}"):
-                        coupon['Wynik'] = 'WYGRANA'   # pełne słowo
-                        recompute_aggregates(rows)
-                        save_session_data(rows)
-                        st.success("✅ Kupon rozliczony jako WYGRANA")
-                        st.rerun()
-                    
-                    if st.button("❌ Przegrana", key=f"lose_{coupon['Kupon']}"):
-                        coupon['Wynik'] = 'PRZEGRANA' # pełne słowo
-                        coupon['Wygrana brutto'] = "0.00"
-                        recompute_aggregates(rows)
-                        save_session_data(rows)
-                        st.success("❌ Kupon rozliczony jako PRZEGRANA")
-                        st.rerun()
-                    
-                    if st.button("🗑️ Usuń", key=f"delete_{coupon['Kupon']}", type="secondary"):
-                        if delete_coupon(rows, coupon['Kupon']):
-                            recompute_aggregates(rows)
-                            save_session_data(rows)
-                            st.success(f"✅ Usunięto kupon #{coupon['Kupon']}")
-                            st.rerun()
-                        else:
-                            st.error(f"❌ Nie udało się usunąć kuponu #{coupon['Kupon']}")
+        # Jedna edytowalna tabela zamiast expandera i trzech przycisków na kupon -
+        # liczba widgetów nie rośnie z liczbą oczekujących kuponów.
+        edited_df = st.data_editor(
+            pending_df,
+            column_config={
+                "Wynik": st.column_config.SelectboxColumn(
+                    "Wynik",
+                    options=["OCZEKUJE", "WYGRANA", "PRZEGRANA"],
+                    required=True
+                ),
+                "Usuń": st.column_config.CheckboxColumn("🗑️ Usuń", default=False)
+            },
+            disabled=["Kupon", "Nazwa", "Kurs", "Stawka (S)", "Potencjalna wygrana brutto"],
+            hide_index=True,
+            use_container_width=True,
+            key=editor_key
+        )
+        
+        if st.button("💾 Zapisz rozliczenia", type="primary"):
+            positions = {id(row): i for i, row in enumerate(rows)}
+            changed_positions = []
+            settled_numbers = []
+            delete_numbers = []
+            
+            for coupon, result, delete in zip(pending_coupons, edited_df["Wynik"], edited_df["Usuń"]):
+                if delete:
+                    delete_numbers.append(coupon['Kupon'])
+                elif result in ("WYGRANA", "PRZEGRANA"):
+                    coupon['Wynik'] = result   # pełne słowo
+                    settled_numbers.append(coupon['Kupon'])
+                else:
+                    continue
+                changed_positions.append(positions[id(coupon)])
+            
+            if changed_positions:
+                # delete_coupons usuwa pierwszy kupon o każdym numerze
+                deleted_count = delete_coupons(rows, delete_numbers) if delete_numbers else 0
+                # Sumy przed pierwszym zmienionym kuponem się nie zmieniają
+                update_from(rows, min(changed_positions))
+                save_session_data(rows)
+                if settled_numbers:
+                    st.success(f"✅ Rozliczono kupony: {', '.join(settled_numbers)}")
+                if deleted_count:
+                    st.success(f"✅ Usunięto {deleted_count} kuponów")
+                st.rerun()
+            else:
+                st.info("ℹ️ Brak zmian do zapisania")
         
         st.markdown("---")
+
+
+@st.fragment
+def display_new_coupon_panel(rows: list, status: dict):
+    """
+    Wyświetla przycisk i formularz dodawania nowego kuponu.
     
-    # B) DODAWANIE NOWEGO KUPONU - przycisk zawsze dostępny
+    Fragment - zmiana kursu lub stawki (pola poza formularzem) przelicza
+    tylko rekomendację, bez ponownego rysowania statusu i tabeli kuponów.
+    Po dodaniu kuponu odświeżana jest cała aplikacja.
+    """
+    # Przycisk pokazuje formularz - wystarczy odświeżyć sam fragment
     if st.button("🎲 Nowy kupon", type="primary", use_container_width=True):
         st.session_state.show_new_coupon = True
-        st.rerun()
+        st.rerun(scope="fragment")
     
     # Uniwersalny formularz dodawania kuponu
     if st.session_state.get('show_new_coupon', False):
@@ -546,13 +662,171 @@ def main():
                         }
                         
                         rows.append(new_coupon)
-                        recompute_aggregates(rows)
+                        update_from(rows, len(rows) - 1)
                         save_session_data(rows)
                         
                         st.success(f"✅ Dodano kupon #{next_number}")
                         st.success(budget_message)  # Pokaż potwierdzenie budżetu
                         st.session_state.show_new_coupon = False
                         st.rerun()
+
+
+def main():
+    """Główna funkcja aplikacji."""
+    
+    # Inicjalizuj profit_target w session_state z pliku
+    if 'profit_target' not in st.session_state:
+        st.session_state.profit_target = load_profit_target()
+    
+    # Nagłówek aplikacji
+    st.title("🎰 Aplikacja do Stawkowania Kuponów")
+    st.caption(f"🎯 Docelowy zysk: {st.session_state.profit_target} zł")
+    show_flash()
+    
+    # Pobierz dane z session_state
+    rows = get_session_data()
+    
+    # Interfejs do pobierania i wczytywania plików CSV
+    if not rows:
+        st.header("📁 Zarządzanie danymi")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader("📥 Wczytaj dane")
+            uploaded_file = st.file_uploader(
+                "Wybierz plik CSV z danymi kuponów",
+                type=['csv'],
+                help="Wczytaj swój plik CSV z danymi kuponów"
+            )
+            
+            if uploaded_file is not None:
+                if st.button("📂 Wczytaj plik", type="primary"):
+                    rows = load_csv_from_upload(uploaded_file)
+                    if rows:
+                        # Przelicz agregaty po wczytaniu danych
+                        recompute_aggregates(rows)
+                        save_session_data(rows)
+                        st.success(f"✅ Wczytano {len(rows)} kuponów z pliku")
+                        st.rerun()
+        
+        with col2:
+            st.subheader("📤 Pobierz szablon")
+            st.info("Jeśli nie masz jeszcze pliku z danymi, pobierz pusty szablon CSV")
+            
+            # Przygotuj pusty szablon do pobrania
+            empty_csv = create_empty_template_csv()
+            
+            st.download_button(
+                label="📥 Pobierz pusty szablon CSV",
+                data=empty_csv,
+                file_name="szablon_kuponow.csv",
+                mime="text/csv",
+                help="Pobierz pusty szablon CSV, wypełnij go danymi i wczytaj z powrotem"
+            )
+        
+        st.markdown("---")
+    
+    # Jeśli brak danych, pokaż formularz pierwszego kuponu
+    if not rows:
+        st.header("🎲 Utwórz pierwszy kupon")
+        st.info("Witaj! Aby rozpocząć, utwórz pierwszy kupon.")
+        
+        with st.form("first_coupon_form"):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                deposit = st.number_input(
+                    "Początkowy wkład",
+                    min_value=0.01,
+                    step=0.01,
+                    value=100.0,
+                    format="%.2f"
+                )
+            
+            with col2:
+                st.subheader("🎲 Szczegóły pierwszego kuponu")
+            
+            # Pole nazwy
+            coupon_name = st.text_input(
+                "Nazwa kuponu",
+                placeholder="np. Mecz Real vs Barcelona",
+                help="Wpisz opisową nazwę dla tego kuponu"
+            )
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                odds = st.number_input(
+                    "Kurs",
+                    min_value=1.01,
+                    step=0.01,
+                    value=2.5,
+                    format="%.2f"
+                )
+            
+            with col2:
+                stake = st.number_input(
+                    "Stawka",
+                    min_value=0.01,
+                    step=0.01,
+                    value=10.0,
+                    format="%.2f"
+                )
+            
+            submitted = st.form_submit_button("✅ Utwórz pierwszy kupon", type="primary")
+            
+            if submitted:
+                if not validate_odds(odds):
+                    st.error("❌ Kurs musi być większy niż 1.0!")
+                elif not validate_stake(stake):
+                    st.error("❌ Stawka musi być większa niż 0!")
+                else:
+                    # Utwórz pierwszy kupon
+                    first_coupon = {
+                        "Kupon": "1",
+                        "Nazwa": coupon_name if coupon_name.strip() else "Kupon #1",
+                        "Wynik": "OCZEKUJE",
+                        "Stawka (S)": f"{stake:.2f}",
+                        "Kurs": f"{odds:.2f}",
+                        "Zasilenie": f"{deposit:.2f}",
+                        "Suma zasieleń": "0.00",
+                        "Suma włożona do tej pory": "0.00",
+                        "Wygrana brutto": "0.00",
+                        "Saldo": "0.00",
+                        "Zysk netto": "0.00"
+                    }
+                    
+                    rows = [first_coupon]
+                    recompute_aggregates(rows)
+                    save_session_data(rows)
+                    st.success("✅ Pierwszy kupon utworzony!")
+                    st.rerun()
+        
+        return
+    
+    # Oblicz aktualny status
+    status = get_session_status(rows)
+    
+    if not status:
+        st.error("❌ Błąd podczas obliczania statusu gry.")
+        return
+    
+    # Wyświetl status gry
+    st.header("📊 Bieżący stan gry")
+    display_status_cards(status)
+    display_game_status(status)
+    
+    # Dodatkowe ostrzeżenie gdy budżet jest 0
+    if status['budget'] <= 0:
+        st.error("🚨 **UWAGA!** Wykorzystałeś cały dostępny budżet! Nie możesz grać dalej bez zasilenia konta.")
+        st.info("💡 **Co robić:** Zasil konto w sekcji 'Zarządzanie środkami' w sidebar, aby kontynuować grę.")
+    
+    # A) KUPONY OCZEKUJĄCE - lista wszystkich oczekujących z przyciskami rozliczania
+    display_pending_coupons(rows)
+    
+    # B) DODAWANIE NOWEGO KUPONU - przycisk zawsze dostępny
+    display_new_coupon_panel(rows, status)
     
     # Wyświetl tabelę kuponów
     st.header("📋 Historia kuponów")
@@ -560,8 +834,7 @@ def main():
     
     # Dodatkowe opcje w sidebar
     with st.sidebar:
-        st.markdown("---")
-        st.subheader("💰 Zarządzanie środkami")
+        section_header("💰 Zarządzanie środkami")
         
         # Wpłata
         with st.expander("💵 Wpłata", expanded=False):
@@ -579,7 +852,7 @@ def main():
                     deposit_coupon = create_deposit_coupon(deposit_amount, next_number)
                     
                     rows.append(deposit_coupon)
-                    recompute_aggregates(rows)
+                    update_from(rows, len(rows) - 1)
                     save_session_data(rows)
                     st.success(f"✅ Wpłacono {deposit_amount:.2f} zł")
                     st.rerun()
@@ -597,7 +870,7 @@ def main():
                 
                 if st.form_submit_button("💸 Wypłać", type="primary"):
                     # Pobierz aktualny budżet
-                    status = get_current_status(rows, st.session_state.profit_target)
+                    status = get_session_status(rows)
                     if not status:
                         st.error("❌ Błąd podczas obliczania statusu budżetu")
                     else:
@@ -608,7 +881,7 @@ def main():
                             withdrawal_coupon = create_withdrawal_coupon(withdrawal_amount, next_number, status['sum_deposits'])
                             
                             rows.append(withdrawal_coupon)
-                            recompute_aggregates(rows)
+                            update_from(rows, len(rows) - 1)
                             save_session_data(rows)
                             st.success(f"✅ Wypłacono {withdrawal_amount:.2f} zł")
                             st.rerun()
@@ -646,27 +919,32 @@ def main():
             else:
                 st.info("Brak transakcji")
         
-        st.markdown("---")
-        st.subheader("🗑️ Zarządzanie kuponami")
+        section_header("🗑️ Zarządzanie kuponami")
         
         # Edytuj kupon
         with st.expander("✏️ Edytuj kupon", expanded=False):
             if rows:
-                # Lista kuponów oczekujących na rozliczenie
-                pending_coupons = [row for row in rows if is_pending(row)]
+                # Lista kuponów oczekujących na rozliczenie - ta sama, zapamiętana
+                # do zmiany danych, co w tabeli rozliczeń
+                pending_coupons = get_pending_table_data(rows)[0]
                 
                 if pending_coupons:
+                    pending_labels = coupon_labels(pending_coupons)
+                    # Numer -> pierwszy oczekujący kupon o tym numerze
+                    pending_by_number = {}
+                    for coupon in pending_coupons:
+                        pending_by_number.setdefault(coupon['Kupon'], coupon)
                     with st.form("edit_coupon_form"):
                         # Wybór kuponu do edycji
                         selected_coupon = st.selectbox(
                             "Wybierz kupon do edycji:",
-                            [row['Kupon'] for row in pending_coupons],
-                            format_func=lambda x: next((row['Nazwa'] for row in pending_coupons if row['Kupon'] == x), f"Kupon #{x}"),
+                            list(pending_labels),
+                            format_func=pending_labels.__getitem__,
                             key="edit_coupon_select"
                         )
                         
                         # Znajdź wybrany kupon
-                        coupon_to_edit = next((row for row in pending_coupons if row['Kupon'] == selected_coupon), None)
+                        coupon_to_edit = pending_by_number.get(selected_coupon)
                         
                         if coupon_to_edit:
                             col1, col2 = st.columns(2)
@@ -698,7 +976,8 @@ def main():
                             
                             if st.form_submit_button("✅ Zapisz zmiany", type="primary"):
                                 if edit_coupon(rows, selected_coupon, new_name, new_stake, new_odds):
-                                    recompute_aggregates(rows)
+                                    # Sumy przed edytowanym kuponem się nie zmieniają
+                                    update_from(rows, find_coupon_index(rows, selected_coupon))
                                     save_session_data(rows)
                                     st.success(f"✅ Kupon #{selected_coupon} został edytowany")
                                     st.rerun()
@@ -713,25 +992,25 @@ def main():
         if rows:
             last_coupon = rows[-1]
             last_coupon_name = last_coupon.get('Nazwa', f"#{last_coupon['Kupon']}")
-            if st.button(f"🗑️ Usuń ostatni kupon ({last_coupon_name})", type="secondary", use_container_width=True):
-                if delete_coupon(rows, last_coupon['Kupon']):
-                    recompute_aggregates(rows)
-                    save_session_data(rows)
-                    st.success(f"✅ Usunięto kupon #{last_coupon['Kupon']}")
-                    st.rerun()
-                else:
-                    st.error(f"❌ Nie udało się usunąć kuponu #{last_coupon['Kupon']}")
+            st.button(
+                f"🗑️ Usuń ostatni kupon ({last_coupon_name})",
+                type="secondary",
+                use_container_width=True,
+                on_click=delete_last_coupon_cb,
+                args=(rows,)
+            )
         
         # Usuń wybrane kupony
         with st.expander("🗑️ Usuń wybrane kupony", expanded=False):
             if rows:
                 with st.form("delete_multiple_form"):
                     # Lista wszystkich kuponów
-                    coupon_numbers = [row["Kupon"] for row in rows]
+                    # Mapa etykiet zapamiętana do zmiany danych - klucze są listą opcji
+                    labels = get_coupon_labels(rows)
                     selected_coupons = st.multiselect(
                         "Wybierz kupony do usunięcia:",
-                        coupon_numbers,
-                        format_func=lambda x: next((row['Nazwa'] for row in rows if row['Kupon'] == x), f"Kupon #{x}"),
+                        list(labels),
+                        format_func=labels.__getitem__,
                         key="delete_multiple_sidebar"
                     )
                     
@@ -739,24 +1018,16 @@ def main():
                         st.warning(f"⚠️ Zaznaczono {len(selected_coupons)} kuponów do usunięcia")
                     
                     # Przycisk submit zawsze dostępny
-                    submitted = st.form_submit_button("🗑️ Usuń zaznaczone", type="secondary")
-                    
-                    if submitted and selected_coupons:
-                        deleted_count = delete_coupons(rows, selected_coupons)
-                        if deleted_count > 0:
-                            recompute_aggregates(rows)
-                            save_session_data(rows)
-                            st.success(f"✅ Usunięto {deleted_count} kuponów")
-                            st.rerun()
-                        else:
-                            st.error("❌ Nie udało się usunąć żadnego kuponu")
-                    elif submitted and not selected_coupons:
-                        st.warning("⚠️ Wybierz kupony do usunięcia")
+                    st.form_submit_button(
+                        "🗑️ Usuń zaznaczone",
+                        type="secondary",
+                        on_click=delete_selected_coupons_cb,
+                        args=(rows,)
+                    )
             else:
                 st.info("Brak kuponów w bazie danych")
         
-        st.markdown("---")
-        st.subheader("📁 Zarządzanie plikami")
+        section_header("📁 Zarządzanie plikami")
         
         # Przycisk do pobrania aktualnych danych
         if rows:
@@ -788,8 +1059,7 @@ def main():
                         st.success(f"✅ Zastąpiono dane - wczytano {len(new_rows)} kuponów")
                         st.rerun()
         
-        st.markdown("---")
-        st.subheader("🔧 Opcje")
+        section_header("🔧 Opcje")
         
         if st.button("💾 Utwórz backup"):
             backup_name = backup_csv()